@@ -1,7 +1,13 @@
-import json
-import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
+from typing import Dict, List
 from transactions import TransactionManager
+from aggregates import to_cents
+from results import SavingsGoal
+from persistence import locked, unit_of_work
+from instrumentation import timed
+from recurrence import assign_ids, due_occurrences, RecurringScheduler, FREQUENCIES, DAY_FORMAT
+from utils import DataValidationError
 
 GOALS_FILE = "savings_goals.json"
 RECURRING_FILE = "recurring_transactions.json"
@@ -11,77 +17,88 @@ class AdvancedFeatures:
     def __init__(self, transaction_manager: TransactionManager):
         self.transaction_manager = transaction_manager
         self.goals = self._load_json(GOALS_FILE)
-        self.recurring = self._load_json(RECURRING_FILE)
+        self.recurring = self._load_recurring()
+        self._scheduler = None
 
     # -----------------------------
     # Shared JSON Helpers
     # -----------------------------
     def _load_json(self, filename):
-        if os.path.exists(filename):
-            try:
-                with open(filename, "r") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        return self.transaction_manager.storage.load_document(filename)
 
     def _save_json(self, filename, data):
-        with open(filename, "w") as f:
-            json.dump(data, f, indent=4)
-
-    def set_savings_goal(self, username: str, goal_name: str, target_amount: float):
-        """Create or update a savings goal."""
-        if username not in self.goals:
-            self.goals[username] = {}
-        self.goals[username][goal_name] = {
-            "target": target_amount,
-            "saved": 0.0,
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        self._save_json(GOALS_FILE, self.goals)
-        print(f"Goal '{goal_name}' created with target ${target_amount:,.2f}")
-
-    def update_savings_progress(self, username: str):
-        """Recalculate savings progress based on user's income transactions."""
-        if username not in self.goals:
-            return None
-
-        user_txns = self.transaction_manager.get_user_transactions(username)
-        total_income = sum(t["amount"] for t in user_txns if t["type"] == "income")
-        total_expense = sum(t["amount"] for t in user_txns if t["type"] == "expense")
-        net_savings = max(total_income - total_expense, 0)
-
-        for goal_name, goal in self.goals[username].items():
-            goal["saved"] = min(goal["target"], net_savings)
-
-        self._save_json(GOALS_FILE, self.goals)
-
-    def get_savings_goals(self, username: str):
-        """Get all savings goals with progress percentage."""
-        self.update_savings_progress(username)
-        if username not in self.goals or not self.goals[username]:
-            return {"message": "No savings goals found."}
-
-        result = {}
-        for name, goal in self.goals[username].items():
-            progress = (goal["saved"] / goal["target"]) * 100 if goal["target"] > 0 else 0
-            result[name] = {
-                "Target": f"${goal['target']:,.2f}",
-                "Saved": f"${goal['saved']:,.2f}",
-                "Progress (%)": f"{progress:.1f}%",
+        self.transaction_manager.storage.save_document(filename, data)
+
+    def _reload_changed(self):
+        """Pick up goals or schedules another process saved since we read them"""
+        storage = self.transaction_manager.storage
+        if storage.changed(GOALS_FILE):
+            self.goals = self._load_json(GOALS_FILE)
+        if storage.changed(RECURRING_FILE):
+            self.recurring = self._load_recurring()
+            self._scheduler = None
+
+    def _load_recurring(self) -> Dict[str, List[Dict]]:
+        """Schedules by user, each with a stable id (saved with the next write)"""
+        recurring = self._load_json(RECURRING_FILE)
+        for entries in recurring.values():
+            assign_ids(entries)
+        return recurring
+
+    def _queue(self) -> RecurringScheduler:
+        """The next-due heap, built from the schedules on first use after they change"""
+        if self._scheduler is None:
+            self._scheduler = RecurringScheduler(self.recurring)
+        return self._scheduler
+
+    @timed()
+    def set_savings_goal(self, username: str, goal_name: str, target_amount: float) -> SavingsGoal:
+        """Create or reset a savings goal; returns it with its current progress."""
+        with locked():
+            self._reload_changed()
+            if username not in self.goals:
+                self.goals[username] = {}
+            self.goals[username][goal_name] = {
+                "target": target_amount,
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             }
-        return result
+            self._save_json(GOALS_FILE, self.goals)
+        saved = min(target_amount, self._net_savings(username))
+        return SavingsGoal(goal_name, to_cents(target_amount), to_cents(saved))
+
+    def _net_savings(self, username: str) -> float:
+        """Income minus expenses from the running aggregates, never below zero"""
+        totals = self.transaction_manager.get_user_aggregates(username)
+        return max(totals.total("income") - totals.total("expense"), 0)
+
+    @timed()
+    def get_savings_goals(self, username: str) -> List[SavingsGoal]:
+        """The user's goals with progress computed from the running totals.
+
+        Progress is never stored, so it is always current and viewing goals
+        never costs a write; the file is read again only if another process
+        changed it.
+        """
+        self._reload_changed()
+        goals = self.goals.get(username)
+        if not goals:
+            return []
+        net_savings = self._net_savings(username)
+        return [
+            SavingsGoal(name, to_cents(goal["target"]), to_cents(min(goal["target"], net_savings)))
+            for name, goal in goals.items()
+        ]
 
     # ============================================================
+    @timed()
     def add_recurring_transaction(
         self, username: str, amount: float, category: str,
         description: str, t_type: str, frequency: str
-    ):
-        
-        if username not in self.recurring:
-            self.recurring[username] = []
-
-        next_date = datetime.now().strftime("%Y-%m-%d")
+    ) -> Dict:
+        """Schedule a transaction from today on; returns the stored entry"""
+        if frequency.lower() not in FREQUENCIES:
+            raise DataValidationError(f"Invalid frequency: {frequency!r} (expected daily, weekly or monthly)")
+        next_date = datetime.now().strftime(DAY_FORMAT)
         entry = {
             "amount": amount,
             "category": category,
@@ -90,44 +107,88 @@ class AdvancedFeatures:
             "frequency": frequency.lower(),
             "next_date": next_date,
         }
-        self.recurring[username].append(entry)
-        self._save_json(RECURRING_FILE, self.recurring)
-        print(f"Recurring {t_type} of ${amount:.2f} added ({frequency.capitalize()})")
-
-    def process_recurring_transactions(self, username: str):
-        """Check if any recurring transactions are due and apply them."""
-        if username not in self.recurring:
-            return
-
-        today = datetime.now().date()
-        updated = False
-
-        for r in self.recurring[username]:
-            next_date = datetime.strptime(r["next_date"], "%Y-%m-%d").date()
-            if today >= next_date:
-                # Add transaction
-                self.transaction_manager.add_transaction(
-                    username,
-                    r["amount"],
-                    r["category"],
-                    r["description"],
-                    r["type"]
-                )
-                print(f"Processed {r['frequency']} {r['type']} of ${r['amount']:.2f}")
-
-                # Schedule next recurrence
-                if r["frequency"] == "daily":
-                    next_date += timedelta(days=1)
-                elif r["frequency"] == "weekly":
-                    next_date += timedelta(weeks=1)
-                elif r["frequency"] == "monthly":
-                    next_date += timedelta(days=30)
-
-                r["next_date"] = next_date.strftime("%Y-%m-%d")
-                updated = True
-
-        if updated:
+        if entry["frequency"] == "monthly":
+            # Remember the day so a schedule on the 31st returns to it after short months
+            entry["day"] = datetime.now().day
+
+        with unit_of_work():
+            self._reload_changed()
+            queue = self._queue()
+            if username not in self.recurring:
+                self.recurring[username] = []
+            self.recurring[username].append(entry)
+            assign_ids(self.recurring[username])
+            queue.push(username, entry)
+            self._save_json(RECURRING_FILE, self.recurring)
+        return entry
+
+    @timed()
+    def process_recurring_transactions(self, username: str, today=None) -> int:
+        """Apply every occurrence that is due up to today, catching up missed periods.
+
+        All occurrences are added with one bulk write, dated on the day they
+        fell due, and the schedules are saved once. Returns how many
+        transactions were created.
+        """
+        with locked():
+            self._reload_changed()
+            if username not in self.recurring:
+                return 0
+
+            today = today or datetime.now().date()
+            rows = []
+            for r in self.recurring[username]:
+                self._advance(username, r, today, rows)
+
+            if rows:
+                self._apply_recurring_rows(rows)
+        return len(rows)
+
+    @timed()
+    def process_all_recurring_transactions(self, today=None) -> Dict[str, int]:
+        """Apply due occurrences for every user in one batch.
+
+        The schedules are kept in a heap ordered by next_date, so a run takes
+        only the due schedules from its front instead of scanning every
+        user's schedules. Returns the number of transactions created per user.
+        """
+        with unit_of_work():
+            self._reload_changed()
+            queue = self._queue()
+            today = today or datetime.now().date()
+            rows = []
+            applied: Dict[str, int] = {}
+            for username, entry in queue.pop_due(today):
+                due = self._advance(username, entry, today, rows)
+                applied[username] = applied.get(username, 0) + due
+                queue.push(username, entry)
+
+            if rows:
+                self._apply_recurring_rows(rows)
+        return applied
+
+    def _advance(self, username: str, entry: Dict, today, rows: List[Dict]) -> int:
+        """Queue an entry's due occurrences as transaction rows and move next_date on"""
+        due, following = due_occurrences(entry, today)
+        rows.extend({
+            "user": username,
+            "amount": entry["amount"],
+            "category": entry["category"],
+            "description": entry["description"],
+            "type": entry["type"],
+            "date": day.strftime(DAY_FORMAT),
+        } for day in due)
+        entry["next_date"] = following.strftime(DAY_FORMAT)
+        return len(due)
+
+    def _apply_recurring_rows(self, rows: List[Dict]) -> None:
+        # New transactions and advanced schedules reach the disk together
+        with unit_of_work():
+            _, errors = self.transaction_manager.bulk_add_transactions(rows)
             self._save_json(RECURRING_FILE, self.recurring)
+        for error in errors:
+            print(f"Skipped recurring {error}", file=sys.stderr)
 
     def get_recurring_transactions(self, username: str):
+        self._reload_changed()
         return self.recurring.get(username, [])
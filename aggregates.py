@@ -0,0 +1,105 @@
+from typing import Dict, List
+from results import Totals
+
+
+def to_cents(amount) -> int:
+    """Convert an amount to integer cents so running totals never drift"""
+    try:
+        return int(round(float(amount) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+class UserAggregates:
+    """Running totals for one user's transactions, kept in integer cents.
+
+    totals/counts are keyed by transaction type, categories holds expense
+    [cents, count] per category and months holds per-"YYYY-MM" income and
+    expense cents plus the number of transactions of any type.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.totals: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+        self.categories: Dict[str, List[int]] = {}
+        self.months: Dict[str, Dict[str, int]] = {}
+
+    def apply(self, transaction: Dict, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) one transaction's contribution"""
+        cents = sign * to_cents(transaction["amount"])
+        t_type = transaction["type"]
+        self.count += sign
+        self.totals[t_type] = self.totals.get(t_type, 0) + cents
+        self.counts[t_type] = self.counts.get(t_type, 0) + sign
+        if not self.counts[t_type]:
+            del self.totals[t_type], self.counts[t_type]
+
+        if t_type == "expense":
+            bucket = self.categories.setdefault(transaction["category"], [0, 0])
+            bucket[0] += cents
+            bucket[1] += sign
+            if not bucket[1]:
+                del self.categories[transaction["category"]]
+
+        month_key = str(transaction["date"])[:7]
+        month = self.months.setdefault(month_key, {"income": 0, "expense": 0, "count": 0})
+        if t_type in ("income", "expense"):
+            month[t_type] += cents
+        month["count"] += sign
+        if not month["count"]:
+            del self.months[month_key]
+
+    def total(self, t_type: str) -> float:
+        return self.totals.get(t_type, 0) / 100
+
+    def balance(self) -> float:
+        """Income minus expenses, the figure shown as the user's balance"""
+        return (self.totals.get("income", 0) - self.totals.get("expense", 0)) / 100
+
+    def overall(self) -> Totals:
+        """All-time income, expense cents and transaction count"""
+        return Totals(self.totals.get("income", 0), self.totals.get("expense", 0), self.count)
+
+    def month_totals(self, month: str) -> Totals:
+        """month() in cents"""
+        bucket = self.months.get(month)
+        if bucket is None:
+            return Totals()
+        return Totals(bucket["income"], bucket["expense"], bucket["count"])
+
+    def type_count(self, t_type: str) -> int:
+        return self.counts.get(t_type, 0)
+
+    def category_totals(self) -> Dict[str, float]:
+        """Expense totals per category, largest first"""
+        ranked = sorted(self.categories.items(), key=lambda x: x[1][0], reverse=True)
+        return {name: cents / 100 for name, (cents, _) in ranked}
+
+    def month(self, month: str) -> Dict[str, float]:
+        """Income, expense and transaction count for one YYYY-MM"""
+        bucket = self.months.get(month, {"income": 0, "expense": 0, "count": 0})
+        return {
+            "income": bucket["income"] / 100,
+            "expense": bucket["expense"] / 100,
+            "count": bucket["count"],
+        }
+
+
+class AggregateStore:
+    """Per-user UserAggregates, updated incrementally by TransactionManager"""
+
+    def __init__(self):
+        self._users: Dict[str, UserAggregates] = {}
+
+    def apply(self, transaction: Dict, sign: int = 1) -> None:
+        user = transaction["user"]
+        if user not in self._users:
+            self._users[user] = UserAggregates()
+        self._users[user].apply(transaction, sign)
+        if not self._users[user].count:
+            del self._users[user]
+
+    def get(self, username: str) -> UserAggregates:
+        """The user's aggregates; an empty, detached instance if they have no rows"""
+        return self._users.get(username) or UserAggregates()
@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from utils import hash_password, verify_password
+
+HASH_WORKERS_ENV = "PFM_HASH_WORKERS"
+SESSION_SECRET_ENV = "PFM_SESSION_SECRET"
+SESSION_TTL_SECONDS = 15 * 60
+
+_default_hasher = None
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a thread pool.
+
+    bcrypt releases the GIL while it works, so the pool hashes on several
+    cores at once and callers (or an event loop) are not blocked meanwhile.
+    """
+
+    def __init__(self, workers: Optional[int] = None, rounds: Optional[int] = None):
+        workers = workers or int(os.environ.get(HASH_WORKERS_ENV) or 0) or os.cpu_count() or 1
+        self.rounds = rounds   # None: PFM_BCRYPT_ROUNDS or the default
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    def hash(self, password: str) -> "Future[bytes]":
+        return self._pool.submit(hash_password, password, self.rounds)
+
+    def verify(self, password: str, stored_hash: str) -> "Future[bool]":
+        return self._pool.submit(verify_password, password, stored_hash)
+
+    async def hash_async(self, password: str) -> bytes:
+        import asyncio   # only asyncio callers pay for the import
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, hash_password, password, self.rounds)
+
+    async def verify_async(self, password: str, stored_hash: str) -> bool:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, verify_password, password, stored_hash)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+def get_hasher() -> PasswordHasher:
+    """Process-wide hasher shared by every UserManager"""
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = PasswordHasher()
+    return _default_hasher
+
+
+class SessionStore:
+    """Short-lived HMAC-signed session tokens for recently authenticated users.
+
+    A token is "<base64 username>.<expiry>.<signature>". Alongside each live
+    token the store keeps a keyed SHA-256 of the password and stored hash, so
+    logging back in as that user (Switch User) is checked without the bcrypt
+    KDF; a changed stored hash or a wrong password falls back to bcrypt.
+    The secret is random per process unless PFM_SESSION_SECRET is set.
+    """
+
+    def __init__(self, secret: Optional[bytes] = None, ttl: int = SESSION_TTL_SECONDS):
+        env_secret = os.environ.get(SESSION_SECRET_ENV)
+        self.secret = secret or (env_secret.encode("utf-8") if env_secret else secrets.token_bytes(32))
+        self.ttl = ttl
+        self._sessions: Dict[str, Tuple[str, bytes]] = {}
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self.secret, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def _verifier(self, username: str, password: str, stored_hash: str) -> bytes:
+        message = "\0".join((username, stored_hash, password)).encode("utf-8")
+        return hmac.new(self.secret, message, hashlib.sha256).digest()
+
+    def issue(self, username: str, password: str, stored_hash: str) -> str:
+        """Create a token for a user whose password was just verified"""
+        user_part = base64.urlsafe_b64encode(username.encode("utf-8")).decode("ascii").rstrip("=")
+        payload = f"{user_part}.{int(time.time()) + self.ttl}"
+        token = f"{payload}.{self._sign(payload)}"
+        self._sessions[username] = (token, self._verifier(username, password, stored_hash))
+        return token
+
+    def username(self, token: str) -> Optional[str]:
+        """The user a token was issued to, or None if it is forged or expired"""
+        try:
+            user_part, expires, signature = token.split(".")
+            if not hmac.compare_digest(signature, self._sign(f"{user_part}.{expires}")):
+                return None
+            if int(expires) < time.time():
+                return None
+            padded = user_part + "=" * (-len(user_part) % 4)
+            return base64.urlsafe_b64decode(padded).decode("utf-8")
+        except (ValueError, TypeError):
+            return None
+
+    def token_for(self, username: str) -> Optional[str]:
+        """The user's live token, dropping it once expired"""
+        session = self._sessions.get(username)
+        if session is None:
+            return None
+        if self.username(session[0]) != username:
+            del self._sessions[username]
+            return None
+        return session[0]
+
+    def check(self, username: str, password: str, stored_hash: str) -> bool:
+        """True if the user has a live session and this is the password it was issued for"""
+        if self.token_for(username) is None:
+            return False
+        expected = self._sessions[username][1]
+        return hmac.compare_digest(expected, self._verifier(username, password, stored_hash))
+
+    def revoke(self, username: str) -> None:
+        self._sessions.pop(username, None)
@@ -0,0 +1,335 @@
+"""Benchmarks for the managers on deterministic synthetic data.
+
+    python benchmark.py                          # 1k, 10k and 100k rows
+    python benchmark.py --scales 1000 10000000 --out results.json
+    python benchmark.py --storage sqlite --only search reports
+
+Each scale is generated into its own temporary directory, so the data files
+in the working directory are never touched. Results are written as JSON for
+comparing versions; progress goes to stderr.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from advancedFeatures import AdvancedFeatures, GOALS_FILE, RECURRING_FILE
+from reports import ReportsManager, BUDGET_FILE
+from storage import FileStorage, SQLiteStorage, Storage, DB_FILE, STORAGE_ENV
+from transactions import TransactionManager
+from users import UserManager
+from utils import (
+    hash_password, DATE_FORMAT, TRANSACTION_FIELDS, USERS_FILE, TRANSACTIONS_FILE
+)
+
+SCALES = (1_000, 10_000, 100_000)
+BENCHMARKS = ("load", "startup", "cold_start", "search", "reports", "add", "recurring", "login")
+EAGER_LIMIT = 1_000_000      # full in-memory loads are skipped above this many rows
+PASSWORD = "Bench_mark#1"
+SEED = 20240101
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# (category, relative frequency, typical amount)
+EXPENSES = (
+    ("Food", 30, 25.0), ("Transport", 15, 12.0), ("Shopping", 12, 60.0),
+    ("Entertainment", 10, 35.0), ("Utilities", 8, 90.0), ("Health", 5, 50.0),
+    ("Rent", 5, 1200.0), ("Travel", 3, 400.0),
+)
+INCOME = (("Salary", 6, 3500.0), ("Freelance", 3, 600.0), ("Interest", 1, 15.0))
+INCOME_SHARE = 0.12
+START = datetime(2023, 1, 1)
+DAYS = 730                   # the generated history spans two years
+TODAY = (START + timedelta(days=DAYS)).date()
+
+
+def users_for(rows: int) -> int:
+    """Default user count: roughly 200 transactions per user"""
+    return max(5, min(rows // 200, 5000))
+
+
+def generate(directory: str, rows: int, users: int, seed: int = SEED, rounds: int = 4) -> Dict:
+    """Write a complete synthetic data set (users, transactions, budgets,
+    goals, recurring items) into directory; the same seed gives the same files.
+
+    User activity is heavy-tailed, amounts are log-normal around a typical
+    value per category, and rows are written in date order like real appends.
+    All users share one password hash so generation does not pay for bcrypt.
+    """
+    rng = random.Random(seed)
+    names = [f"user{i:05d}" for i in range(users)]
+    activity = [rng.paretovariate(1.2) for _ in names]
+    cumulative = []
+    total = 0.0
+    for weight in activity:
+        total += weight
+        cumulative.append(total)
+
+    expense_names = [c for c, _, _ in EXPENSES]
+    expense_weights = [w for _, w, _ in EXPENSES]
+    income_names = [c for c, _, _ in INCOME]
+    income_weights = [w for _, w, _ in INCOME]
+    typical = {c: amount for c, _, amount in EXPENSES + INCOME}
+
+    span = DAYS * 86400
+    with open(os.path.join(directory, TRANSACTIONS_FILE), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TRANSACTION_FIELDS)
+        for i in range(rows):
+            user = rng.choices(names, cum_weights=cumulative)[0]
+            if rng.random() < INCOME_SHARE:
+                t_type, category = "income", rng.choices(income_names, income_weights)[0]
+            else:
+                t_type, category = "expense", rng.choices(expense_names, expense_weights)[0]
+            amount = round(typical[category] * rng.lognormvariate(0, 0.6), 2)
+            moment = START + timedelta(seconds=int(span * i / rows) + rng.randrange(3600))
+            writer.writerow([i + 1, user, amount, category, f"{category.lower()} #{i + 1}",
+                             t_type, moment.strftime(DATE_FORMAT)])
+
+    stored_hash = hash_password(PASSWORD, rounds).decode("utf-8")
+    last_month = (TODAY.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    documents = {
+        USERS_FILE: {name: {"password": stored_hash} for name in names},
+        BUDGET_FILE: {name: {last_month: {"limit": round(rng.uniform(500, 5000), 2)}} for name in names},
+        GOALS_FILE: {
+            name: {f"goal {g}": {"target": round(rng.uniform(1000, 50000), 2),
+                                 "created_at": START.strftime(DATE_FORMAT)}
+                   for g in range(rng.randint(1, 2))}
+            for name in names
+        },
+        RECURRING_FILE: {},
+    }
+    # A few users have monthly schedules that are two months behind
+    for name in rng.sample(names, max(1, min(len(names) // 10, 200))):
+        due = TODAY - timedelta(days=rng.randint(35, 60))
+        documents[RECURRING_FILE][name] = [{
+            "amount": typical["Rent"], "category": "Rent", "description": "rent",
+            "type": "expense", "frequency": "monthly",
+            "next_date": due.strftime("%Y-%m-%d"), "day": due.day,
+        }]
+    for filename, data in documents.items():
+        with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return {"rows": rows, "users": users, "seed": seed, "busiest_user": names[activity.index(max(activity))]}
+
+
+def import_files(db_path: str) -> None:
+    """Copy the generated files into a SQLite database, like manage.py migrate"""
+    source = FileStorage()
+    target = SQLiteStorage(db_path)
+    target.save_transactions(source.load_transactions())
+    target.ensure_sequence()
+    target.save_users(source.load_users())
+    for name in (BUDGET_FILE, GOALS_FILE, RECURRING_FILE):
+        target.save_document(name, source.load_document(name))
+    target.conn.close()
+
+
+def open_storage(kind: str) -> Storage:
+    """A fresh backend on the current directory, so nothing is cached between runs"""
+    return SQLiteStorage(DB_FILE) if kind == "sqlite" else FileStorage()
+
+
+def run_main(storage: str, *argv: str) -> None:
+    """Run main.py in a fresh interpreter (imports and data loading included)"""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(MAIN), **{STORAGE_ENV: storage})
+    subprocess.run([sys.executable, MAIN, *argv], check=True, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def measure(name: str, fn: Callable[[], object], repeat: int = 1, ops: int = 1) -> Dict:
+    """Run fn repeat times; ops is how many operations one run performs"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    best = min(times)
+    return {
+        "benchmark": name,
+        "ops": ops,
+        "repeat": repeat,
+        "best_s": round(best, 6),
+        "median_s": round(statistics.median(times), 6),
+        "per_op_us": round(best / ops * 1e6, 3),
+    }
+
+
+def run_scale(rows: int, args) -> List[Dict]:
+    """Generate one data set and time every selected benchmark on it"""
+    results: List[Dict] = []
+    selected = set(args.only or BENCHMARKS)
+    workdir = tempfile.mkdtemp(prefix=f"pfm-bench-{rows}-")
+    previous = os.getcwd()
+    users = args.users or users_for(rows)
+    try:
+        os.chdir(workdir)
+        started = time.perf_counter()
+        info = generate(workdir, rows, users, args.seed)
+        if args.storage == "sqlite":
+            import_files(DB_FILE)
+        storage = open_storage(args.storage)
+        log(f"  generated {rows:,} rows for {users:,} users in {time.perf_counter() - started:.1f}s")
+
+        def record(result: Dict) -> None:
+            result.update(rows=rows, users=users, storage=args.storage)
+            results.append(result)
+            if "skipped" in result:
+                log(f"  {result['benchmark']:<28} skipped ({result['skipped']})")
+            else:
+                log(f"  {result['benchmark']:<28} {result['best_s'] * 1000:>10.2f} ms "
+                    f"({result['per_op_us']:,.1f} µs/op)")
+
+        rng = random.Random(args.seed)
+        names = [f"user{i:05d}" for i in range(users)]
+        sample = rng.sample(names, min(len(names), 50))
+        busiest = info["busiest_user"]
+        month = (TODAY.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+        year_start = f"{int(month[:4]) - 1}-{month[5:]}"   # 13 months up to month
+
+        if "load" in selected:
+            if rows > args.eager_limit:
+                record({"benchmark": "load_transactions", "skipped": "above --eager-limit"})
+            else:
+                record(measure("load_transactions", storage.load_transactions, args.repeat))
+
+        if "startup" in selected:
+            if rows > args.eager_limit:
+                record({"benchmark": "manager_init_eager", "skipped": "above --eager-limit"})
+            else:
+                record(measure("manager_init_eager",
+                               lambda: TransactionManager(storage=open_storage(args.storage)), args.repeat))
+            record(measure("manager_init_lazy_first_user",
+                           lambda: TransactionManager(storage=open_storage(args.storage), lazy=True)
+                           .get_user_transactions(busiest), args.repeat))
+
+        if "cold_start" in selected:
+            record(measure("cold_start_help", lambda: run_main(args.storage, "--help"), args.repeat))
+            record(measure("cold_start_report_dashboard", lambda: run_main(
+                args.storage, "report", "dashboard", "--user", busiest), args.repeat))
+
+        manager = TransactionManager(storage=storage, lazy=True)
+        for name in sample + [busiest]:
+            manager.get_user_transactions(name)
+
+        if "search" in selected:
+            start = (TODAY - timedelta(days=30)).strftime("%Y-%m-%d")
+            end = TODAY.strftime("%Y-%m-%d")
+            record(measure("search_category", lambda: [
+                manager.search_transactions(name, category="Food") for name in sample
+            ], args.repeat, len(sample)))
+            record(measure("search_date_range", lambda: [
+                manager.search_transactions(name, start_date=start, end_date=end) for name in sample
+            ], args.repeat, len(sample)))
+            record(measure("search_busiest_user", lambda: manager.search_transactions(
+                busiest, category="Food", start_date=start, end_date=end), args.repeat))
+
+        if "reports" in selected:
+            reports = ReportsManager(manager)
+            for report, call in (
+                ("dashboard_summary", reports.dashboard_summary),
+                ("category_breakdown", reports.category_breakdown),
+                ("monthly_report", lambda name: reports.monthly_report(name, month)),
+                ("budget_status", lambda name: reports.budget_status(name, month)),
+                ("calculate_health_score", reports.calculate_health_score),
+                ("trend_report_months", lambda name: reports.trend_report(name, year_start, month)),
+                ("trend_report_weeks", lambda name: reports.trend_report(name, year_start, month, "week")),
+                ("trend_report_categories", lambda name: reports.trend_report(name, year_start, month, "category")),
+            ):
+                record(measure(f"report_{report}", lambda call=call: [call(name) for name in sample],
+                               args.repeat, len(sample)))
+            record(measure("report_dashboard_cold", lambda: ReportsManager(
+                TransactionManager(storage=open_storage(args.storage), lazy=True)
+            ).dashboard_summary(busiest), args.repeat))
+
+        if "recurring" in selected:
+            features = AdvancedFeatures(manager)
+            scheduled = list(features.recurring)
+            # Runs once: catching up moves every schedule past today
+            record(measure("process_recurring_transactions", lambda: [
+                features.process_recurring_transactions(name, TODAY) for name in scheduled
+            ], 1, len(scheduled)))
+
+        if "add" in selected:
+            count = args.adds
+            record(measure("add_transaction", lambda: [
+                manager.add_transaction(sample[i % len(sample)], 12.5, "Food", "bench", "expense")
+                for i in range(count)
+            ], 1, count))
+
+        if "login" in selected:
+            accounts = UserManager(storage=storage)
+            accounts.users[busiest]["password"] = hash_password(PASSWORD, args.rounds).decode("utf-8")
+
+            def bcrypt_login():
+                accounts.sessions.revoke(busiest)
+                accounts.login(busiest, PASSWORD)
+            record(measure(f"login_bcrypt_{args.rounds}_rounds", bcrypt_login, args.repeat))
+            record(measure("login_session", lambda: accounts.login(busiest, PASSWORD), args.repeat))
+
+        manager.storage.sync()
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the finance managers on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES),
+                        help="transaction counts to generate (default: 1000 10000 100000)")
+    parser.add_argument("--users", type=int, help="users per data set (default: rows / 200, 5-5000)")
+    parser.add_argument("--storage", choices=("file", "sqlite"), default="file")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the best is reported")
+    parser.add_argument("--adds", type=int, default=200, help="transactions added by the add benchmark")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost for the login benchmark")
+    parser.add_argument("--eager-limit", type=int, default=EAGER_LIMIT,
+                        help=f"skip full in-memory loads above this many rows (default: {EAGER_LIMIT:,})")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    report = {
+        "created_at": datetime.now().strftime(DATE_FORMAT),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "seed": args.seed,
+        "results": [],
+    }
+    # Managers print status lines; keep stdout for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        for rows in args.scales:
+            log(f"{rows:,} rows ({args.storage})")
+            report["results"].extend(run_scale(rows, args))
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        log(f"Results → {args.out}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import csv
+import io
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import persistence
+from utils import (
+    iter_transactions, date_key, FileAccessError, DataValidationError,
+    BINARY_FILE, EPOCH_KEY, TRANSACTION_FIELDS, TRANSACTIONS_FILE
+)
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency: reads fall back to struct
+    np = None
+
+# Layout: header | fixed-width records | string table.
+# The string table is a uint32 count followed by (uint32 length, UTF-8 bytes)
+# entries; user, category, type and description hold indexes into it.
+# Amounts are the float64 values the CSV parses to, and a date that does not
+# read back as the same string (e.g. an unparseable one) keeps its text in
+# raw_date, so rows round-trip exactly.
+MAGIC = b"PFMB"
+VERSION = 2
+# magic, version, record count, string table offset, and the size and
+# mtime_ns of the CSV the file was written from (-1 if none)
+HEADER = struct.Struct("<4sH2xQQqq")
+RECORD = struct.Struct("<qIdIB3xqII")    # id, user, amount, category, type, date, description, raw_date
+RECORD_FIELDS = ("id", "user", "amount", "category", "type", "date", "description", "raw_date")
+NO_DATE = -(2 ** 63)                     # unparseable date; numpy reads it as NaT
+NO_STRING = 0xFFFFFFFF                   # raw_date when the date reads back unchanged
+EPOCH = datetime(1970, 1, 1)
+
+Source = Tuple[int, int]                 # (size, mtime_ns) of a CSV
+
+if np is not None:
+    RECORD_DTYPE = np.dtype({
+        "names": list(RECORD_FIELDS),
+        "formats": ["<i8", "<u4", "<f8", "<u4", "u1", "<i8", "<u4", "<u4"],
+        "offsets": [0, 8, 12, 20, 24, 28, 36, 40],
+        "itemsize": RECORD.size,
+    })
+
+
+def csv_source(path: str = TRANSACTIONS_FILE) -> Optional[Source]:
+    """The (size, mtime_ns) a binary file records for the CSV it mirrors"""
+    current = persistence.signature(path)
+    return None if current is None else (current[1], current[2])
+
+
+def binary_source(path: str = BINARY_FILE) -> Optional[Source]:
+    """The CSV signature stored in a binary file's header, or None if the
+    file is missing, of another version or was not written from a CSV"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, version, _, _, size, mtime_ns = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or size < 0:
+        return None
+    return size, mtime_ns
+
+
+class _DateFormatter:
+    """Epoch seconds to DATE_FORMAT text; strftime is the slow part, so
+    each day is formatted once"""
+
+    def __init__(self):
+        self.days: Dict[int, str] = {}
+
+    def __call__(self, seconds: int) -> str:
+        day, rest = divmod(seconds, 86400)
+        prefix = self.days.get(day)
+        if prefix is None:
+            prefix = self.days[day] = (EPOCH + timedelta(days=day)).strftime("%Y-%m-%d")
+        hours, rest = divmod(rest, 3600)
+        return f"{prefix} {hours:02d}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+def write_binary(transactions: Iterable[Dict], path: str = BINARY_FILE,
+                 source: Optional[Source] = None) -> int:
+    """Write transactions in the fixed-width format; returns the record count.
+
+    source is csv_source() of the CSV the rows were read from; the live
+    binary file is only used while that CSV is unchanged. The file is
+    replaced atomically (and coalesced inside a unit of work).
+    """
+    strings: Dict[str, int] = {}
+
+    def code(value) -> int:
+        return strings.setdefault(str(value), len(strings))
+
+    formatted = _DateFormatter()
+    count = 0
+    buffer = io.BytesIO()
+    buffer.write(HEADER.pack(MAGIC, VERSION, 0, 0, -1, -1))
+    for t in transactions:
+        try:
+            seconds = date_key(t["date"]) - EPOCH_KEY
+        except DataValidationError:
+            seconds = NO_DATE
+        date = str(t["date"])
+        raw_date = NO_STRING if seconds != NO_DATE and formatted(seconds) == date else code(date)
+        buffer.write(RECORD.pack(
+            int(t["id"]), code(t["user"]), float(t["amount"]),
+            code(t["category"]), code(t["type"]), seconds, code(t["description"]), raw_date
+        ))
+        count += 1
+    table_offset = buffer.tell()
+    buffer.write(struct.pack("<I", len(strings)))
+    for value in strings:
+        encoded = value.encode("utf-8")
+        buffer.write(struct.pack("<I", len(encoded)))
+        buffer.write(encoded)
+    buffer.seek(0)
+    size, mtime_ns = source or (-1, -1)
+    buffer.write(HEADER.pack(MAGIC, VERSION, count, table_offset, size, mtime_ns))
+    try:
+        persistence.write_file(path, buffer.getvalue())
+    except OSError as e:
+        raise FileAccessError(f"Error writing binary transactions file: {str(e)}")
+    return count
+
+
+class BinaryTransactions:
+    """Memory-mapped, read-only view over a binary transactions file.
+
+    records is a zero-copy numpy structured array when numpy is installed,
+    otherwise a memoryview of the record block. Use as a context manager, and
+    drop any record arrays before the file is closed.
+    """
+
+    def __init__(self, path: str = BINARY_FILE):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise FileAccessError(f"Error opening binary transactions file: {str(e)}")
+        self._view = memoryview(self._mmap)
+        if len(self._view) < HEADER.size:
+            self.close()
+            raise DataValidationError(f"{path} is not a binary transactions file")
+        magic, version, self.count, self._table_offset, *source = HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise DataValidationError(f"{path} is not a version {VERSION} binary transactions file")
+        self.source: Optional[Source] = tuple(source) if source[0] >= 0 else None
+        self._strings: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "BinaryTransactions":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._view.release()
+        self._mmap.close()
+
+    @property
+    def records(self):
+        block = self._view[HEADER.size:HEADER.size + self.count * RECORD.size]
+        if np is None:
+            return block
+        return np.frombuffer(block, dtype=RECORD_DTYPE, count=self.count)
+
+    @property
+    def strings(self) -> List[str]:
+        """The decoded string table, parsed on first access"""
+        if self._strings is None:
+            view, pos = self._view, self._table_offset
+            (total,) = struct.unpack_from("<I", view, pos)
+            pos += 4
+            strings = []
+            for _ in range(total):
+                (length,) = struct.unpack_from("<I", view, pos)
+                pos += 4
+                strings.append(bytes(view[pos:pos + length]).decode("utf-8"))
+                pos += length
+            self._strings = strings
+        return self._strings
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Yield rows shaped like load_transactions() output"""
+        strings = self.strings
+        formatted = _DateFormatter()
+        block = self._view[HEADER.size:HEADER.size + self.count * RECORD.size]
+        for t_id, user, amount, category, t_type, seconds, description, raw_date in RECORD.iter_unpack(block):
+            if raw_date != NO_STRING:
+                date = strings[raw_date]
+            else:
+                date = formatted(seconds)
+            yield {
+                "id": t_id,
+                "user": strings[user],
+                "amount": amount,
+                "category": strings[category],
+                "description": strings[description],
+                "type": strings[t_type],
+                "date": date,
+            }
+
+    def to_columnar(self):
+        """Build a columnar.ColumnarTransactions straight from the record arrays"""
+        from columnar import ColumnarTransactions, _require_numpy
+        _require_numpy()
+        records = self.records
+        strings = self.strings
+        columns = {}
+        names = {}
+        for field in ("user", "category", "type"):
+            codes, inverse = np.unique(records[field], return_inverse=True)
+            columns[field] = inverse.astype("int32")
+            names[field] = [strings[c] for c in codes]
+        return ColumnarTransactions(
+            records["id"].copy(), np.rint(records["amount"] * 100).astype("int64"),
+            columns["user"], columns["category"], columns["type"],
+            records["date"].astype("datetime64[s]"),
+            names["user"], names["category"], names["type"],
+        )
+
+
+def csv_to_binary(bin_path: str = BINARY_FILE, csv_path: str = TRANSACTIONS_FILE) -> int:
+    """Convert a transactions CSV, recording which file it was so the live
+    binary is only read while transactions.csv is that same file.
+
+    Journaled changes are not included; loads replay them on top.
+    """
+    with persistence.locked():
+        return write_binary(iter_transactions(csv_path), bin_path, csv_source(csv_path))
+
+
+def binary_to_csv(bin_path: str = BINARY_FILE, csv_path: str = "transactions_export.csv") -> int:
+    """Write a binary transactions file back out as CSV"""
+    if os.path.abspath(csv_path) == os.path.abspath(bin_path):
+        raise DataValidationError("Source and destination are the same file")
+    count = 0
+    try:
+        with BinaryTransactions(bin_path) as binary, \
+                open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=TRANSACTION_FIELDS)
+            writer.writeheader()
+            for row in binary:
+                writer.writerow(row)
+                count += 1
+    except (csv.Error, OSError) as e:
+        raise FileAccessError(f"Error writing transactions file: {str(e)}")
+    return count
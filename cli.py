@@ -0,0 +1,273 @@
+"""Non-interactive commands for main.py, e.g.
+
+    python main.py report dashboard --user rana
+    python main.py report monthly --user rana --month 2025-10 --json
+    python main.py trend --user rana --from 2025-01 --to 2025-12 --by week --chart
+    python main.py add --user rana --amount 12.50 --type expense --category Food
+    python main.py batch jobs.txt
+
+Only the managers a command needs are built (see managers.py). Command
+results go to stdout, as text or (with --json) one JSON document per
+command with plain numbers; the managers' status messages go to stderr.
+
+A batch file holds one command per line in the same syntax (blank lines
+and # comments are skipped). All of them run against one loaded state and
+their file writes are coalesced into one flush per file at the end; how
+many writes that saved is printed to stderr.
+"""
+import argparse
+import contextlib
+import json
+import shlex
+import sys
+from typing import Dict, List, Optional
+from managers import get_transaction_manager, get_reports_manager, get_advanced_features
+from recurrence import FREQUENCIES
+from utils import (
+    DataError, DataValidationError, TRANSACTION_TYPES, parse_amount, parse_month, validate_transaction
+)
+
+
+# ---------- Argument types ----------
+def month_arg(value: str) -> str:
+    try:
+        return parse_month(value)
+    except DataValidationError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def amount_arg(value: str) -> float:
+    try:
+        return parse_amount(value)
+    except DataValidationError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+# ---------- Commands ----------
+# Each returns plain data (numbers, not formatted strings) for render()
+
+def add(args) -> Dict:
+    row = validate_transaction({
+        "user": args.user, "amount": args.amount, "type": args.type,
+        "category": args.category, "description": args.description,
+    })
+    return get_transaction_manager().add_transaction(
+        row["user"], row["amount"], row["category"], row["description"], row["type"]
+    )
+
+
+def search(args) -> List[Dict]:
+    return get_transaction_manager().search_transactions(args.user, args.category, args.start, args.end)
+
+
+def delete(args) -> Dict:
+    manager = get_transaction_manager()
+    transaction = manager.get_transaction_by_id(args.id)
+    if transaction is None or transaction["user"] != args.user:
+        raise DataValidationError(f"No transaction {args.id} for {args.user}")
+    manager.delete_transaction(args.id)
+    return {"deleted": args.id}
+
+
+def report(args):
+    return get_reports_manager().report(args.user, args.name, args.month)
+
+
+def trend(args):
+    from reports import trend_chart, trend_table
+    result = get_reports_manager().trend_report(args.user, args.start, args.end, args.by)
+    if args.json:
+        return result.to_dict()
+    return trend_chart(result) if args.chart else trend_table(result)
+
+
+def set_budget(args) -> Dict:
+    return get_reports_manager().set_monthly_budget(args.user, args.month, args.limit)
+
+
+def goals(args) -> List[Dict]:
+    return [goal.to_dict() for goal in get_advanced_features().get_savings_goals(args.user)]
+
+
+def add_goal(args) -> Dict:
+    return get_advanced_features().set_savings_goal(args.user, args.name, args.target).to_dict()
+
+
+def recurring(args) -> List[Dict]:
+    return get_advanced_features().get_recurring_transactions(args.user)
+
+
+def add_recurring(args) -> Dict:
+    return get_advanced_features().add_recurring_transaction(
+        args.user, args.amount, args.category, args.description, args.type, args.frequency
+    )
+
+
+def run_recurring(args) -> Dict[str, int]:
+    features = get_advanced_features()
+    if args.user:
+        return {args.user: features.process_recurring_transactions(args.user)}
+    return features.process_all_recurring_transactions()
+
+
+def batch(args) -> int:
+    import persistence
+    parser = build_parser()
+    failed = 0
+    writes = persistence.stats.copy()
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    with source, persistence.unit_of_work():
+        for number, line in enumerate(source, start=1):
+            argv = shlex.split(line, comments=True)
+            if not argv:
+                continue
+            try:
+                command = parser.parse_args(argv)
+            except SystemExit:   # argparse has already printed the problem
+                command = None
+            if command is None or command.func is batch:
+                error = "invalid command" if command is None else "batches cannot be nested"
+                failed += 1
+                report_error(f"line {number}: {error}", args.json or getattr(command, "json", False))
+                continue
+            command.json = command.json or args.json
+            if execute(command, f"line {number}: "):
+                failed += 1
+    print(f"batch: {persistence.stats - writes}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+# ---------- Output ----------
+def render(value) -> str:
+    """Plain-text form of a command result"""
+    if value is None:
+        return "(none)"
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, list):
+        if not value:
+            return "(none)"
+        return "\n".join(" | ".join(render(field) for field in row.values()) for row in value)
+    if isinstance(value, dict):
+        if not value:
+            return "(none)"
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, dict):
+                lines.append(f"{key}:")
+                lines.extend(f"  {line}" for line in render(item).splitlines())
+            else:
+                lines.append(f"{key:<25}: {render(item)}")
+        return "\n".join(lines)
+    return str(value)
+
+
+def report_error(message: str, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps({"error": message}))
+    else:
+        print(f"Error: {message}", file=sys.stderr)
+
+
+def execute(args, prefix: str = "") -> int:
+    """Run one parsed command and print its result; returns the exit status"""
+    out = sys.stdout
+    try:
+        # Managers print status lines; keep stdout for results
+        with contextlib.redirect_stdout(sys.stderr):
+            result = args.func(args)
+    except DataError as e:
+        report_error(f"{prefix}{e}", args.json)
+        return 1
+    print(json.dumps(result) if args.json else render(result), file=out)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Personal Finance Manager (run without arguments for the interactive menu)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="print the result as JSON")
+    user = argparse.ArgumentParser(add_help=False, parents=[common])
+    user.add_argument("--user", required=True)
+
+    p = commands.add_parser("add", parents=[user], help="add a transaction")
+    p.add_argument("--amount", type=amount_arg, required=True)
+    p.add_argument("--type", choices=TRANSACTION_TYPES, required=True)
+    p.add_argument("--category", default="")
+    p.add_argument("--description", default="")
+    p.set_defaults(func=add)
+
+    p = commands.add_parser("search", parents=[user], help="list transactions, optionally filtered")
+    p.add_argument("--category")
+    p.add_argument("--from", dest="start", help="YYYY-MM-DD")
+    p.add_argument("--to", dest="end", help="YYYY-MM-DD (inclusive)")
+    p.set_defaults(func=search)
+
+    p = commands.add_parser("delete", parents=[user], help="delete one of the user's transactions")
+    p.add_argument("id", type=int)
+    p.set_defaults(func=delete)
+
+    p = commands.add_parser("report", parents=[user], help="one report, as numbers")
+    # Checked by ReportsManager.report, so --help does not import reports
+    p.add_argument("name", help="dashboard, monthly, categories, health or budget")
+    p.add_argument("--month", type=month_arg, help="YYYY-MM for the monthly and budget reports")
+    p.set_defaults(func=report)
+
+    p = commands.add_parser("trend", parents=[user], help="totals per month, week or category with changes")
+    p.add_argument("--from", dest="start", type=month_arg, required=True, help="first month, YYYY-MM")
+    p.add_argument("--to", dest="end", type=month_arg, required=True, help="last month, YYYY-MM")
+    p.add_argument("--by", choices=("month", "week", "category"), default="month")
+    p.add_argument("--chart", action="store_true", help="sparklines instead of a table")
+    p.set_defaults(func=trend)
+
+    p = commands.add_parser("set-budget", parents=[user], help="set a monthly budget")
+    p.add_argument("--month", type=month_arg, required=True)
+    p.add_argument("--limit", type=amount_arg, required=True)
+    p.set_defaults(func=set_budget)
+
+    p = commands.add_parser("goals", parents=[user], help="savings goals and progress")
+    p.set_defaults(func=goals)
+
+    p = commands.add_parser("add-goal", parents=[user], help="create or reset a savings goal")
+    p.add_argument("--name", required=True)
+    p.add_argument("--target", type=amount_arg, required=True)
+    p.set_defaults(func=add_goal)
+
+    p = commands.add_parser("recurring", parents=[user], help="list recurring transactions")
+    p.set_defaults(func=recurring)
+
+    p = commands.add_parser("add-recurring", parents=[user], help="schedule a recurring transaction")
+    p.add_argument("--amount", type=amount_arg, required=True)
+    p.add_argument("--type", choices=TRANSACTION_TYPES, required=True)
+    p.add_argument("--frequency", choices=FREQUENCIES, required=True)
+    p.add_argument("--category", default="")
+    p.add_argument("--description", default="")
+    p.set_defaults(func=add_recurring)
+
+    p = commands.add_parser("run-recurring", parents=[common], help="apply due recurring transactions")
+    p.add_argument("--user", help="only this user (default: everyone)")
+    p.set_defaults(func=run_recurring)
+
+    p = commands.add_parser("batch", parents=[common], help="run the commands in a file (- for stdin)")
+    p.add_argument("file")
+    p.set_defaults(func=batch)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.func is batch:
+        try:
+            return batch(args)
+        except OSError as e:
+            report_error(f"Cannot read {args.file}: {e}", args.json)
+            return 1
+    return execute(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
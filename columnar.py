@@ -0,0 +1,156 @@
+from typing import Dict, Iterable, List
+from aggregates import UserAggregates, to_cents
+from results import Totals
+from utils import date_key, DataError, DataValidationError, EPOCH_KEY
+from instrumentation import timed, add_rows
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency: pip install numpy
+    np = None
+
+
+class ColumnarTransactions:
+    """Read-only, column-oriented snapshot of the transactions for vectorized analytics.
+
+    amount is int64 cents, user/category/type are int32 codes into the
+    *_names lists (dictionary encoding) and date is datetime64[s]. Rows whose
+    date cannot be parsed are stored as NaT and left out of the month buckets.
+    It is a batch tool (manage.py analyze): the snapshot does not follow
+    later writes, so the managers keep using their own running aggregates.
+    """
+
+    def __init__(self, ids, amounts, users, categories, types, dates,
+                 user_names: List[str], category_names: List[str], type_names: List[str]):
+        self.ids = ids
+        self.amounts = amounts
+        self.users = users
+        self.categories = categories
+        self.types = types
+        self.dates = dates
+        self.user_names = user_names
+        self.category_names = category_names
+        self.type_names = type_names
+        self._user_codes = {name: code for code, name in enumerate(user_names)}
+        self._type_codes = {name: code for code, name in enumerate(type_names)}
+        self._cache: Dict[str, UserAggregates] = {}  # the snapshot never changes
+        # Months since 1970-01, the bucket key for monthly totals
+        self.months = dates.astype("datetime64[M]").astype("int64")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Dict]) -> "ColumnarTransactions":
+        """Encode transaction dicts (as returned by load_transactions) into columns"""
+        _require_numpy()
+        user_codes: Dict[str, int] = {}
+        category_codes: Dict[str, int] = {}
+        type_codes: Dict[str, int] = {}
+        ids, amounts, users, categories, types, seconds = [], [], [], [], [], []
+        not_a_time = np.iinfo("int64").min
+        for t in transactions:
+            ids.append(int(t["id"]))
+            amounts.append(to_cents(t["amount"]))
+            users.append(user_codes.setdefault(t["user"], len(user_codes)))
+            categories.append(category_codes.setdefault(t["category"], len(category_codes)))
+            types.append(type_codes.setdefault(t["type"], len(type_codes)))
+            try:
+                seconds.append(date_key(t["date"]) - EPOCH_KEY)
+            except DataValidationError:
+                seconds.append(not_a_time)
+        return cls(
+            np.array(ids, dtype="int64"),
+            np.array(amounts, dtype="int64"),
+            np.array(users, dtype="int32"),
+            np.array(categories, dtype="int32"),
+            np.array(types, dtype="int32"),
+            np.array(seconds, dtype="int64").astype("datetime64[s]"),
+            list(user_codes), list(category_codes), list(type_codes),
+        )
+
+    @classmethod
+    def load(cls, storage=None) -> "ColumnarTransactions":
+        """Build a snapshot from the configured storage backend"""
+        from storage import get_storage
+        return cls.from_transactions((storage or get_storage()).load_transactions())
+
+    def _type_mask(self, mask, t_type: str):
+        code = self._type_codes.get(t_type)
+        if code is None:
+            return np.zeros_like(mask)
+        return mask & (self.types == code)
+
+    @timed("columnar.totals_by_user")
+    def totals_by_user(self) -> Dict[str, Totals]:
+        """Income, expenses and count for every user at once"""
+        users = len(self.user_names)
+        add_rows("columnar.totals_by_user", len(self))
+        everything = np.ones(len(self), dtype=bool)
+        counts = np.bincount(self.users, minlength=users)
+        income, expense = (
+            np.bincount(self.users, weights=np.where(self._type_mask(everything, t_type), self.amounts, 0),
+                        minlength=users)
+            for t_type in ("income", "expense")
+        )
+        return {
+            name: Totals(int(round(income[code])), int(round(expense[code])), int(counts[code]))
+            for code, name in enumerate(self.user_names)
+        }
+
+    def user_aggregates(self, username: str) -> UserAggregates:
+        """Same totals TransactionManager.get_user_aggregates keeps, via masked reductions"""
+        if username not in self._cache:
+            self._cache[username] = self._reduce(username)
+        return self._cache[username]
+
+    @timed("columnar.user_aggregates")
+    def _reduce(self, username: str) -> UserAggregates:
+        result = UserAggregates()
+        code = self._user_codes.get(username)
+        if code is None:
+            return result
+        add_rows("columnar.user_aggregates", len(self.users))
+        mask = self.users == code
+        result.count = int(np.count_nonzero(mask))
+
+        type_totals = np.bincount(self.types[mask], weights=self.amounts[mask],
+                                  minlength=len(self.type_names))
+        type_counts = np.bincount(self.types[mask], minlength=len(self.type_names))
+        for t_code, t_name in enumerate(self.type_names):
+            if type_counts[t_code]:
+                result.totals[t_name] = int(round(type_totals[t_code]))
+                result.counts[t_name] = int(type_counts[t_code])
+
+        expense = self._type_mask(mask, "expense")
+        cat_totals = np.bincount(self.categories[expense], weights=self.amounts[expense],
+                                 minlength=len(self.category_names))
+        cat_counts = np.bincount(self.categories[expense], minlength=len(self.category_names))
+        for c_code in np.flatnonzero(cat_counts):
+            result.categories[self.category_names[c_code]] = [
+                int(round(cat_totals[c_code])), int(cat_counts[c_code])
+            ]
+
+        dated = mask & ~np.isnat(self.dates)
+        if np.any(dated):
+            first = int(self.months[dated].min())
+            buckets = self.months[dated] - first
+            counts = np.bincount(buckets)
+            income = self._type_mask(dated, "income")[dated]
+            expense = self._type_mask(dated, "expense")[dated]
+            amounts = self.amounts[dated]
+            income_totals = np.bincount(buckets, weights=np.where(income, amounts, 0), minlength=len(counts))
+            expense_totals = np.bincount(buckets, weights=np.where(expense, amounts, 0), minlength=len(counts))
+            for offset in np.flatnonzero(counts):
+                key = np.datetime_as_string(np.datetime64(first + int(offset), "M"))
+                result.months[key] = {
+                    "income": int(round(income_totals[offset])),
+                    "expense": int(round(expense_totals[offset])),
+                    "count": int(counts[offset]),
+                }
+        return result
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise DataError("The columnar store needs numpy (pip install numpy)")
@@ -0,0 +1,197 @@
+"""Lightweight counters for the hot paths: calls, latency, rows scanned, bytes written.
+
+Recording is off by default and costs one flag check per call until
+enable() is called (main.py --profile does this). Operation names are
+"<module>.<function>", e.g. "transactions.search_transactions".
+"""
+import sys
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional
+
+PROMETHEUS_FILE = "pfm_metrics.prom"
+# Latency histogram upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_enabled = False
+
+
+class OperationStats:
+    """Totals for one named operation"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets: List[int] = [0] * (len(BUCKETS) + 1)   # last one is +Inf
+        self.rows = 0
+
+    def observe(self, seconds: float) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+operations: Dict[str, OperationStats] = {}
+bytes_written: Dict[str, int] = {}
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    operations.clear()
+    bytes_written.clear()
+
+
+def _stats(name: str) -> OperationStats:
+    stats = operations.get(name)
+    if stats is None:
+        stats = operations[name] = OperationStats()
+    return stats
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block as one call of `name`"""
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stats(name).observe(time.perf_counter() - started)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorator form of span(); the name defaults to module.function"""
+    def decorate(fn: Callable) -> Callable:
+        label = name or f"{fn.__module__}.{fn.__name__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _stats(label).observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def add_rows(name: str, count: int) -> None:
+    """Count rows parsed or examined by `name`"""
+    if _enabled:
+        _stats(name).rows += count
+
+
+def add_bytes(path: str, count: int) -> None:
+    """Count bytes that reached a file"""
+    if _enabled:
+        bytes_written[path] = bytes_written.get(path, 0) + count
+
+
+# ---------- Reports ----------
+def format_text() -> str:
+    """A table of every recorded operation, slowest total first"""
+    lines = [f"{'operation':<44} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'rows':>10}"]
+    ranked = sorted(operations.items(), key=lambda item: item[1].seconds, reverse=True)
+    for name, stats in ranked:
+        mean = stats.seconds / stats.calls if stats.calls else 0.0
+        lines.append(f"{name:<44} {stats.calls:>7} {stats.seconds * 1000:>10.2f} "
+                     f"{mean * 1000:>9.3f} {stats.max_seconds * 1000:>9.3f} {stats.rows:>10,}")
+    if bytes_written:
+        lines.append("")
+        lines.append(f"{'file':<44} {'bytes written':>15}")
+        for path, count in sorted(bytes_written.items()):
+            lines.append(f"{path:<44} {count:>15,}")
+    writes = _write_stats()
+    if writes.requested:
+        lines.append("")
+        lines.append(f"writes: {writes}")
+    return "\n".join(lines)
+
+
+def _write_stats():
+    """persistence.stats, imported late because persistence imports this module"""
+    import persistence
+    return persistence.stats
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus() -> str:
+    """The same data in the Prometheus text exposition format"""
+    lines = [
+        "# HELP pfm_calls_total Calls per instrumented operation.",
+        "# TYPE pfm_calls_total counter",
+    ]
+    for name, stats in sorted(operations.items()):
+        lines.append(f'pfm_calls_total{{op="{_label(name)}"}} {stats.calls}')
+
+    lines += [
+        "# HELP pfm_latency_seconds Latency per instrumented operation.",
+        "# TYPE pfm_latency_seconds histogram",
+    ]
+    for name, stats in sorted(operations.items()):
+        op = _label(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), stats.buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'pfm_latency_seconds_bucket{{op="{op}",le="{le}"}} {cumulative}')
+        lines.append(f'pfm_latency_seconds_sum{{op="{op}"}} {stats.seconds:.6f}')
+        lines.append(f'pfm_latency_seconds_count{{op="{op}"}} {stats.calls}')
+
+    lines += [
+        "# HELP pfm_rows_scanned_total Rows parsed or examined per operation.",
+        "# TYPE pfm_rows_scanned_total counter",
+    ]
+    for name, stats in sorted(operations.items()):
+        lines.append(f'pfm_rows_scanned_total{{op="{_label(name)}"}} {stats.rows}')
+
+    lines += [
+        "# HELP pfm_bytes_written_total Bytes written per data file.",
+        "# TYPE pfm_bytes_written_total counter",
+    ]
+    for path, count in sorted(bytes_written.items()):
+        lines.append(f'pfm_bytes_written_total{{file="{_label(path)}"}} {count}')
+
+    writes = _write_stats()
+    lines += [
+        "# HELP pfm_writes_total File writes asked for by the managers and performed after coalescing.",
+        "# TYPE pfm_writes_total counter",
+        f'pfm_writes_total{{stage="requested"}} {writes.requested}',
+        f'pfm_writes_total{{stage="performed"}} {writes.performed}',
+        "# HELP pfm_write_bytes_total Bytes asked to be written and actually written.",
+        "# TYPE pfm_write_bytes_total counter",
+        f'pfm_write_bytes_total{{stage="requested"}} {writes.bytes_requested}',
+        f'pfm_write_bytes_total{{stage="performed"}} {writes.bytes_written}',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def dump(path: str = PROMETHEUS_FILE, stream=None) -> None:
+    """Print the text table (to stream, default stderr) and write the Prometheus file"""
+    print(format_text(), file=stream or sys.stderr)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(format_prometheus())
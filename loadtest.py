@@ -0,0 +1,231 @@
+"""Load test for the report endpoints of server.py.
+
+    python loadtest.py                                   # own server on 100k synthetic rows
+    python loadtest.py --rows 1000000 --concurrency 64 --requests 50000
+    python loadtest.py --url http://127.0.0.1:8765 --user alice --password ...
+
+Without --url a server is started on data from benchmark.generate() in a
+temporary directory, so the files in the working directory are never
+touched. Each connection is kept open and sends its requests back to back;
+the report endpoints are requested in turn. Requests/sec and p50/p99
+latency per endpoint are logged to stderr and written as JSON.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from benchmark import generate, users_for, PASSWORD, SEED, TODAY
+from reports import MONTHLY_REPORTS, REPORTS
+from utils import DATE_FORMAT
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+ROWS = 100_000
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, host: str, port: int, token: str = ""):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def open(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, object]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(payload)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write((head + "\r\n").encode("latin-1") + payload)
+        await self.writer.drain()
+        response = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(response.split(b" ", 2)[1])
+        length = 0
+        for line in response.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        data = await self.reader.readexactly(length)
+        return status, json.loads(data) if data else None
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)] if ordered else 0.0
+
+
+async def run_load(host: str, port: int, username: str, password: str, month: str,
+                   concurrency: int, total: int) -> Dict:
+    login = Connection(host, port)
+    await login.open()
+    status, body = await login.request("POST", "/login", {"username": username, "password": password})
+    login.close()
+    if status != 200:
+        raise SystemExit(f"Login as {username} failed: {body}")
+    token = body["token"]
+
+    paths = [f"/reports/{name}" + (f"?month={month}" if name in MONTHLY_REPORTS else "")
+             for name in REPORTS]
+    latencies: Dict[str, List[float]] = {path: [] for path in paths}
+    errors = 0
+    issued = 0
+
+    async def worker() -> None:
+        nonlocal errors, issued
+        connection = Connection(host, port, token)
+        await connection.open()
+        try:
+            while issued < total:
+                path = paths[issued % len(paths)]
+                issued += 1
+                started = time.perf_counter()
+                status, _ = await connection.request("GET", path)
+                latencies[path].append(time.perf_counter() - started)
+                if status != 200:
+                    errors += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = []
+    for path, samples in latencies.items():
+        ordered = sorted(samples)
+        endpoints.append({
+            "endpoint": path,
+            "requests": len(ordered),
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        })
+    everything = sorted(sample for samples in latencies.values() for sample in samples)
+    return {
+        "requests": len(everything),
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(everything) / elapsed, 1),
+        "p50_ms": round(percentile(everything, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(everything, 0.99) * 1000, 3),
+        "endpoints": endpoints,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, server: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit("The server did not start listening in time")
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test the report endpoints of server.py")
+    parser.add_argument("--url", help="an already running server (default: start one on synthetic data)")
+    parser.add_argument("--user", help="account to log in as (with --url)")
+    parser.add_argument("--password", help="its password (with --url)")
+    parser.add_argument("--month", help="YYYY-MM for the monthly and budget reports")
+    parser.add_argument("--rows", type=int, default=ROWS, help=f"synthetic transactions (default: {ROWS:,})")
+    parser.add_argument("--users", type=int, help="synthetic users (default: rows / 200, 5-5000)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--concurrency", type=int, default=32, help="open connections (default: 32)")
+    parser.add_argument("--requests", type=int, default=20_000, help="total requests (default: 20,000)")
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    workdir = server = None
+    try:
+        if args.url:
+            if not args.user or not args.password:
+                build_parser().error("--url needs --user and --password")
+            url = urlsplit(args.url)
+            host, port = url.hostname or "127.0.0.1", url.port or 80
+            username, password = args.user, args.password
+            month = args.month or datetime.now().strftime("%Y-%m")
+        else:
+            workdir = tempfile.mkdtemp(prefix="pfm-load-")
+            users = args.users or users_for(args.rows)
+            started = time.perf_counter()
+            info = generate(workdir, args.rows, users, args.seed)
+            log(f"generated {args.rows:,} rows for {users:,} users in {time.perf_counter() - started:.1f}s")
+            host, port = "127.0.0.1", free_port()
+            server = subprocess.Popen(
+                [sys.executable, SERVER, "--host", host, "--port", str(port)], cwd=workdir,
+                env=dict(os.environ, PYTHONPATH=os.path.dirname(SERVER)),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            wait_for_port(port, server)
+            username, password = info["busiest_user"], PASSWORD
+            month = args.month or TODAY.strftime("%Y-%m")
+
+        log(f"{args.requests:,} report requests over {args.concurrency} connections as {username}")
+        result = asyncio.run(run_load(host, port, username, password, month, args.concurrency, args.requests))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for endpoint in result["endpoints"]:
+        log(f"  {endpoint['endpoint']:<36} p50 {endpoint['p50_ms']:>8.3f} ms   p99 {endpoint['p99_ms']:>8.3f} ms")
+    log(f"  {'all':<36} p50 {result['p50_ms']:>8.3f} ms   p99 {result['p99_ms']:>8.3f} ms   "
+        f"{result['requests_per_s']:,.0f} req/s ({result['errors']} errors)")
+
+    report = {
+        "created_at": datetime.now().strftime(DATE_FORMAT),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": args.url or f"synthetic {args.rows:,} rows",
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        log(f"Results → {args.out}")
+    else:
+        print(output)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,38 @@
-import getpass
+import atexit
 
 import sys
-from users import UserManager
-from transactions import TransactionManager
-from reports import ReportsManager
-from datetime import datetime
-from datetime import datetime
-from advancedFeatures import AdvancedFeatures
+from managers import (
+    get_user_manager, get_transaction_manager, get_reports_manager, get_advanced_features
+)
+from utils import DataError, DataValidationError, parse_month
+import instrumentation
+
+# --profile: record call counts, latencies, rows scanned and bytes written,
+# then print them and write pfm_metrics.prom on exit
+if "--profile" in sys.argv:
+    sys.argv.remove("--profile")
+    instrumentation.enable()
+    atexit.register(instrumentation.dump)
 
 
 def pause():
     input("\nPress Enter to continue...")
 
+def read_month():
+    """Ask for a month; the zero-padded YYYY-MM, or None if it is invalid"""
+    try:
+        return parse_month(input("Enter month (YYYY-MM): ").strip())
+    except DataValidationError:
+        return None
+
 def print_header(title: str):
-    user = user_manager.get_current_user()
+    user = get_user_manager().get_current_user()
     name_display = f"👤 {user}" if user else " Not logged in"
     print("\n" + "=" * 60)
     print(f"{title.center(60)}")
     print("=" * 60)
     print(f"{name_display}\n" + "-" * 60)
 
-user_manager = UserManager()
-transaction_manager = TransactionManager()
-reports_manager = ReportsManager(transaction_manager)
-advanced_features = AdvancedFeatures(transaction_manager)
-
-if user_manager.get_current_user():
-    print(f"✅ Welcome back, {user_manager.get_current_user()}! You are already logged in.\n")
-
-
 
 def main_menu():
     while True:
@@ -55,6 +59,8 @@ def main_menu():
 
 
 def user_menu():
+    import getpass
+    user_manager = get_user_manager()
 
     while True:
         print_header("USER MANAGEMENT")
@@ -109,6 +115,7 @@ def user_menu():
 
 
 def transaction_menu():
+    user_manager, transaction_manager = get_user_manager(), get_transaction_manager()
     if not user_manager.get_current_user():
         print("  Please log in first.")
         pause()
@@ -138,12 +145,6 @@ def transaction_menu():
                 )
                 print(f" Transaction added: {txn['id']} ({txn['type']})")
 
-                # Update user balance
-                if t_type == "income":
-                    user_manager.update_balance(username, amount)
-                elif t_type == "expense":
-                    user_manager.update_balance(username, -amount)
-
             except ValueError:
                 print(" Invalid amount. Must be a number.")
 
@@ -187,10 +188,13 @@ def transaction_menu():
             cat = input("Category (optional): ").strip() or None
             start = input("Start date (YYYY-MM-DD) optional: ").strip() or None
             end = input("End date (YYYY-MM-DD) optional: ").strip() or None
-            results = transaction_manager.search_transactions(username, cat, start, end)
-            if not results:
-                print(" No matching transactions found.")
+            try:
+                results = transaction_manager.search_transactions(username, cat, start, end)
+            except DataValidationError as e:
+                print(f" {e}")
             else:
+                if not results:
+                    print(" No matching transactions found.")
                 for t in results:
                     print(f"{t['date']} | {t['category']} | {t['type']} | {t['amount']:.2f} | {t['description']}")
 
@@ -201,12 +205,7 @@ def transaction_menu():
         pause()
 
 def report_menu():
-    def _validate_month(month_str: str) -> bool:
-        try:
-            datetime.strptime(month_str, "%Y-%m")
-            return True
-        except Exception:
-            return False
+    user_manager, reports_manager = get_user_manager(), get_reports_manager()
 
     if not user_manager.get_current_user():
         print(" Please log in first.")
@@ -236,8 +235,8 @@ def report_menu():
                 reports_manager.print_report("Dashboard Summary", data)
 
         elif choice == "2":
-            month = input("Enter month (YYYY-MM): ").strip()
-            if not _validate_month(month):
+            month = read_month()
+            if month is None:
                 print("Invalid month format. Expected YYYY-MM.")
             else:
                 data = reports_manager.monthly_report(username, month)
@@ -279,13 +278,7 @@ def report_menu():
 
 
 def budget_submenu(username: str):
-
-    def _validate_month(month_str: str) -> bool:
-        try:
-            datetime.strptime(month_str, "%Y-%m")
-            return True
-        except Exception:
-            return False
+    reports_manager = get_reports_manager()
 
     while True:
         print_header("MONTHLY BUDGET MANAGEMENT")
@@ -295,24 +288,21 @@ def budget_submenu(username: str):
         choice = input("\nEnter your choice: ").strip()
 
         if choice == "1":
-            month = input("Enter month (YYYY-MM): ").strip()
-            if not _validate_month(month):
+            month = read_month()
+            if month is None:
                 print("Invalid month format. Expected YYYY-MM.")
             else:
                 val = input("Enter budget limit: ").strip()
                 try:
                     limit = float(val)
-                    res = reports_manager.set_monthly_budget(username, month, limit)
-                    if res is False:
-                        print("Failed to set budget.")
-                    else:
-                        print(f"Budget set: {month} → {limit:.2f}")
+                    budget = reports_manager.set_monthly_budget(username, month, limit)
+                    print(f"Budget set: {budget['month']} → {budget['limit']:.2f}")
                 except ValueError:
                     print("Invalid number for budget limit.")
 
         elif choice == "2":
-            month = input("Enter month (YYYY-MM): ").strip()
-            if not _validate_month(month):
+            month = read_month()
+            if month is None:
                 print("Invalid month format. Expected YYYY-MM.")
             else:
                 status = reports_manager.budget_status(username, month)
@@ -328,6 +318,7 @@ def budget_submenu(username: str):
             print("Invalid choice.")
         pause()
 def savings_menu(username: str):
+    advanced_features = get_advanced_features()
     while True:
         print_header("SAVINGS GOALS")
         print("1. Add New Goal")
@@ -340,15 +331,17 @@ def savings_menu(username: str):
             name = input("Goal name: ").strip()
             try:
                 target = float(input("Target amount: "))
-                advanced_features.set_savings_goal(username, name, target)
+                goal = advanced_features.set_savings_goal(username, name, target)
+                print(f"Goal '{goal.name}' created with target ${goal.target_cents / 100:,.2f} "
+                      f"({goal.progress_percent}% saved)")
             except ValueError:
                 print("Invalid amount.")
         elif choice == "2":
             goals = advanced_features.get_savings_goals(username)
-            for g_name, g_data in goals.items():
-                print(f"\n🏁 {g_name}")
-                for k, v in g_data.items():
-                    print(f"  {k:<15}: {v}")
+            if not goals:
+                print("No savings goals found.")
+            else:
+                get_reports_manager().print_report("Savings Goals", goals)
         elif choice == "3":
             return
         else:
@@ -357,6 +350,7 @@ def savings_menu(username: str):
 
 
 def recurring_menu(username: str):
+    advanced_features = get_advanced_features()
     while True:
         print_header("RECURRING TRANSACTIONS")
         print("1. Add Recurring Transaction")
@@ -373,9 +367,13 @@ def recurring_menu(username: str):
                 description = input("Description: ").strip()
                 t_type = input("Type (income/expense): ").strip().lower()
                 frequency = input("Frequency (daily/weekly/monthly): ").strip().lower()
-                advanced_features.add_recurring_transaction(
+                entry = advanced_features.add_recurring_transaction(
                     username, amount, category, description, t_type, frequency
                 )
+                print(f"Recurring {entry['type']} of ${entry['amount']:.2f} added "
+                      f"({entry['frequency'].capitalize()}, next on {entry['next_date']})")
+            except DataError as e:
+                print(f"Error: {e}")
             except ValueError:
                 print("Invalid input.")
         elif choice == "2":
@@ -389,7 +387,8 @@ def recurring_menu(username: str):
                         f"- {r['category']} ({r['frequency'].capitalize()} | Next: {r['next_date']})"
                     )
         elif choice == "3":
-            advanced_features.process_recurring_transactions(username)
+            created = advanced_features.process_recurring_transactions(username)
+            print(f"Created {created} transaction(s) from recurring schedules.")
         elif choice == "4":
             return
         else:
@@ -399,31 +398,12 @@ def recurring_menu(username: str):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Non-interactive command, e.g. main.py report dashboard --user NAME
+        from cli import main
+        sys.exit(main(sys.argv[1:]))
     try:
-        class A:
-            def method(self):
-                print("A method")
-            
-        class B(A):
-            def method(self):
-                print("B method")
-                
-
-        class C(A):
-            def method(self):
-                print("C method")
-               
-
-        class D(B, C):
-            def method(self):
-                print("D method")
-                super().method()
-                
-
-        d = D()
-        d.method()
         main_menu()
     except KeyboardInterrupt:
         print("\n\n Exiting... Goodbye!")
         sys.exit(0)
-            
\ No newline at end of file
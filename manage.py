@@ -0,0 +1,329 @@
+import argparse
+import csv
+import sys
+import time
+from datetime import date
+from typing import Dict, Iterator, Tuple
+from reports import BUDGET_FILE
+from aggregates import AggregateStore, to_cents
+from results import Totals
+from advancedFeatures import AdvancedFeatures, GOALS_FILE, RECURRING_FILE
+from storage import FileStorage, SQLiteStorage, DB_FILE, get_storage
+from binstore import BinaryTransactions, csv_to_binary, binary_to_csv, BINARY_FILE
+from transactions import TransactionManager
+from users import UserManager
+from persistence import locked
+from auth import PasswordHasher, SessionStore
+from utils import (
+    DataError, DataValidationError, FileAccessError, repair_duplicate_ids, TRANSACTIONS_FILE,
+    hash_password, verify_password, parse_date, BCRYPT_ROUNDS, BCRYPT_ROUNDS_ENV
+)
+
+DOCUMENT_FILES = (BUDGET_FILE, GOALS_FILE, RECURRING_FILE)
+
+
+def date_arg(value: str) -> date:
+    try:
+        return parse_date(value).date()
+    except DataValidationError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def migrate(args) -> None:
+    """Copy the CSV/JSON data files into a SQLite database"""
+    source = FileStorage()
+    target = SQLiteStorage(args.db)
+
+    with locked():
+        transactions = source.load_transactions()
+        target.save_transactions(transactions)
+        # Ids deleted since are above the largest one copied; keep them retired
+        target.ensure_sequence(source.id_high_water())
+        print(f"Transactions : {len(transactions)}")
+
+        users = source.load_users()
+        target.save_users(users)
+        print(f"Users        : {len(users)}")
+
+        for name in DOCUMENT_FILES:
+            target.save_document(name, source.load_document(name))
+            print(f"Imported     : {name}")
+    print(f"Migration complete → {target.path} (run with PFM_STORAGE=sqlite PFM_DB={target.path})")
+
+
+def repair_ids(args) -> None:
+    """Renumber duplicate transaction ids and persist the id sequence"""
+    storage = get_storage()
+    with locked():
+        transactions = storage.load_transactions()
+        changes = repair_duplicate_ids(transactions)
+        if changes:
+            storage.save_transactions(transactions)
+            for old, new in changes:
+                print(f"  id {old} → {new}")
+            print(f"Renumbered {len(changes)} transaction(s)")
+        else:
+            print("No duplicate ids found")
+        storage.ensure_sequence()
+
+
+def run_recurring(args) -> None:
+    """Apply due recurring transactions for all users (suitable for cron)"""
+    started = time.perf_counter()
+    features = AdvancedFeatures(TransactionManager(lazy=True))
+    applied = features.process_all_recurring_transactions(args.date)
+    elapsed = time.perf_counter() - started
+    for username, count in sorted(applied.items()):
+        print(f"  {username:<20} {count} transaction(s)")
+    print(f"Processed {sum(applied.values())} due occurrence(s) for {len(applied)} user(s) in {elapsed:.2f}s")
+
+
+def verify_balances(args) -> int:
+    """Compare stored user balances with the ones derived from transactions"""
+    storage = get_storage()
+    with locked():
+        users = storage.load_users()
+        totals = AggregateStore()
+        for t in storage.load_transactions():
+            totals.apply(t)
+
+        mismatched = 0
+        for username, record in sorted(users.items()):
+            derived = totals.get(username).balance()
+            stored = record.get("balance")
+            # Accounts created since balances became derived have nothing stored
+            if stored is None or to_cents(stored) == to_cents(derived):
+                continue
+            mismatched += 1
+            print(f"  {username:<20} stored {float(stored):>12,.2f}   derived {derived:>12,.2f}")
+            if args.fix:
+                record["balance"] = derived
+
+        if not mismatched:
+            print(f"All {len(users)} stored balance(s) match the transactions")
+            return 0
+        if args.fix:
+            storage.save_users(users)
+            print(f"Rebuilt {mismatched} stored balance(s) from the transactions")
+            return 0
+        print(f"{mismatched} stored balance(s) differ (run with --fix to rebuild them)")
+        return 1
+
+
+def read_accounts(path: str) -> Iterator[Tuple[str, str]]:
+    """(username, password) pairs from a CSV with username and password columns"""
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+                yield row.get("username", ""), row.get("password", "")
+    except (csv.Error, OSError) as e:
+        raise FileAccessError(f"Error reading accounts {path}: {str(e)}")
+
+
+def add_users(args) -> int:
+    """Register a whole batch of users with one write"""
+    started = time.perf_counter()
+    registered, errors = UserManager().register_users(read_accounts(args.file))
+    elapsed = time.perf_counter() - started
+    for error in errors:
+        print(f"  skipped {error}")
+    print(f"Registered {len(registered)} user(s) in {elapsed:.2f}s")
+    return 1 if errors else 0
+
+
+def bench_bcrypt(args) -> None:
+    """Time bcrypt at several cost factors, one at a time and on the hashing pool"""
+    password = "Bench_mark#1"
+    hasher = PasswordHasher(workers=args.workers)
+    sessions = SessionStore()
+    print(f"{'rounds':>6} {'hash ms':>9} {'verify ms':>10} {'pool hashes/s':>14} {'session ms':>11}")
+    for rounds in args.rounds:
+        started = time.perf_counter()
+        stored = hash_password(password, rounds).decode("utf-8")
+        hash_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        verify_password(password, stored)
+        verify_ms = (time.perf_counter() - started) * 1000
+
+        hasher.rounds = rounds
+        started = time.perf_counter()
+        for future in [hasher.hash(password) for _ in range(args.count)]:
+            future.result()
+        rate = args.count / (time.perf_counter() - started)
+
+        sessions.issue("bench", password, stored)
+        started = time.perf_counter()
+        sessions.check("bench", password, stored)
+        session_ms = (time.perf_counter() - started) * 1000
+        print(f"{rounds:>6} {hash_ms:>9.1f} {verify_ms:>10.1f} {rate:>14.1f} {session_ms:>11.3f}")
+    hasher.shutdown()
+    print(f"Set {BCRYPT_ROUNDS_ENV} to choose the cost for new passwords (default {BCRYPT_ROUNDS})")
+
+
+def to_binary(args) -> None:
+    """Convert transactions CSV data to the memory-mappable binary format"""
+    count = csv_to_binary(args.out, args.csv or TRANSACTIONS_FILE)
+    print(f"Wrote {count} records → {args.out}")
+
+
+def from_binary(args) -> None:
+    """Convert a binary transactions file back to CSV"""
+    count = binary_to_csv(args.source, args.out)
+    print(f"Wrote {count} rows → {args.out}")
+
+
+def analyze(args) -> None:
+    """Per-user totals (or one user's months) from a columnar snapshot, vectorized with numpy"""
+    from columnar import ColumnarTransactions
+    started = time.perf_counter()
+    if args.binary:
+        with BinaryTransactions(args.binary) as binary:
+            snapshot = binary.to_columnar()
+    else:
+        snapshot = ColumnarTransactions.load()
+    loaded = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if args.user:
+        months = snapshot.user_aggregates(args.user).months
+        rows = [(month, Totals(bucket["income"], bucket["expense"], bucket["count"]))
+                for month, bucket in sorted(months.items())]
+    else:
+        rows = sorted(snapshot.totals_by_user().items())
+    elapsed = time.perf_counter() - started
+
+    print(f"{'month' if args.user else 'user':<20} {'income':>14} {'expense':>14} {'net':>14} {'count':>8}")
+    for label, totals in rows:
+        print(f"{label:<20} {totals.income:>14,.2f} {totals.expenses:>14,.2f} {totals.net:>14,.2f} {totals.count:>8,}")
+    print(f"{len(snapshot):,} transactions loaded in {loaded:.2f}s, summed in {elapsed * 1000:.1f} ms")
+
+
+def read_statement(path: str, username: str) -> Iterator[Dict]:
+    """Map a bank-statement CSV onto transaction rows.
+
+    Headers are matched case-insensitively (description may also be called
+    memo or payee). Without a type column, negative amounts are expenses and
+    the sign is dropped. With one, a negative amount must be an expense;
+    a row whose sign and type disagree keeps its sign so validation rejects it.
+    """
+    aliases = {"memo": "description", "payee": "description"}
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for raw in csv.DictReader(f):
+                row = {}
+                for key, value in raw.items():
+                    if key is not None:
+                        name = key.strip().lower()
+                        row.setdefault(aliases.get(name, name), (value or "").strip())
+                row["user"] = username
+                try:
+                    amount = float(row.get("amount", ""))
+                except ValueError:
+                    yield row
+                    continue
+                if not row.get("type"):
+                    row["type"] = "expense" if amount < 0 else "income"
+                    row["amount"] = abs(amount)
+                elif amount < 0 and row["type"].lower() == "expense":
+                    row["amount"] = abs(amount)
+                yield row
+    except (csv.Error, OSError) as e:
+        raise FileAccessError(f"Error reading statement {path}: {str(e)}")
+
+
+def import_statement(args) -> None:
+    """Bulk-import a bank statement for one user"""
+    manager = TransactionManager(lazy=True)
+    started = time.perf_counter()
+
+    def report(done: int) -> None:
+        elapsed = time.perf_counter() - started
+        print(f"\r  validated {done:,} rows ({done / elapsed if elapsed else 0:,.0f} rows/sec)",
+              end="", flush=True)
+
+    added, errors = manager.bulk_add_transactions(
+        read_statement(args.file, args.user), batch_size=args.batch_size, progress=report
+    )
+    elapsed = time.perf_counter() - started
+    print()
+    for error in errors[:20]:
+        print(f"  skipped {error}")
+    if len(errors) > 20:
+        print(f"  ... and {len(errors) - 20} more")
+    rate = len(added) / elapsed if elapsed else 0
+    print(f"Imported {len(added):,} transactions for {args.user} in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Personal Finance Manager maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("migrate", help="import the CSV/JSON files into SQLite")
+    p.add_argument("--db", default=DB_FILE, help=f"database file (default: {DB_FILE})")
+    p.set_defaults(func=migrate)
+
+    p = commands.add_parser("repair-ids", help="renumber duplicate transaction ids")
+    p.set_defaults(func=repair_ids)
+
+    p = commands.add_parser("run-recurring", help="apply due recurring transactions for all users")
+    p.add_argument("--date", type=date_arg, help="process as of YYYY-MM-DD (default: today)")
+    p.set_defaults(func=run_recurring)
+
+    p = commands.add_parser("verify-balances", help="check users.json balances against the transactions")
+    p.add_argument("--fix", action="store_true", help="overwrite stored balances with the derived ones")
+    p.set_defaults(func=verify_balances)
+
+    p = commands.add_parser("add-users", help="register users listed in a CSV file")
+    p.add_argument("file", help="CSV with username and password columns")
+    p.set_defaults(func=add_users)
+
+    p = commands.add_parser("bench-bcrypt", help="time password hashing at several cost factors")
+    p.add_argument("--rounds", type=int, nargs="+", default=[10, 12, 14], help="cost factors to try")
+    p.add_argument("--count", type=int, default=16, help="hashes per pool measurement")
+    p.add_argument("--workers", type=int, help="pool threads (default: CPU count)")
+    p.set_defaults(func=bench_bcrypt)
+
+    p = commands.add_parser("to-binary", help="convert transactions to the binary format")
+    p.add_argument("--csv", help="source CSV (default: the live transactions.csv; needs --out)")
+    p.add_argument("--out", help=f"binary file (default: {BINARY_FILE}, only for the live CSV)")
+    p.set_defaults(func=to_binary)
+
+    p = commands.add_parser("from-binary", help="convert a binary transactions file to CSV")
+    p.add_argument("source", nargs="?", default=BINARY_FILE, help="binary file to read")
+    p.add_argument("--out", default="transactions_export.csv", help="CSV file to write")
+    p.set_defaults(func=from_binary)
+
+    p = commands.add_parser("analyze", help="per-user totals from a columnar snapshot (needs numpy)")
+    p.add_argument("--user", help="that user's monthly totals instead")
+    p.add_argument("--binary", nargs="?", const=BINARY_FILE,
+                   help=f"read a binary transactions file (default: {BINARY_FILE}) instead of the live data")
+    p.set_defaults(func=analyze)
+
+    p = commands.add_parser("import", help="bulk-import a bank statement CSV")
+    p.add_argument("file", help="statement CSV with date, amount, category, description, type columns")
+    p.add_argument("--user", required=True, help="user who owns the imported transactions")
+    p.add_argument("--batch-size", type=int, default=5000, help="rows per validation batch")
+    p.set_defaults(func=import_statement)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.func is to_binary:
+        if args.csv and not args.out:
+            # The live binary file must only ever mirror the live CSV
+            parser.error("to-binary --csv needs an explicit --out")
+        args.out = args.out or BINARY_FILE
+    try:
+        return args.func(args) or 0
+    except DataError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
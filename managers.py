@@ -0,0 +1,31 @@
+"""Process-wide managers, each built the first time something asks for it.
+
+Importing this module is cheap: the manager modules (and bcrypt, numpy,
+sqlite3 behind them) are imported only when a manager is first requested,
+so a command that needs one report never loads users or hashing code.
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_transaction_manager():
+    from transactions import TransactionManager
+    return TransactionManager(lazy=True)
+
+
+@lru_cache(maxsize=None)
+def get_user_manager():
+    from users import UserManager
+    return UserManager(transaction_manager=get_transaction_manager())
+
+
+@lru_cache(maxsize=None)
+def get_reports_manager():
+    from reports import ReportsManager
+    return ReportsManager(get_transaction_manager())
+
+
+@lru_cache(maxsize=None)
+def get_advanced_features():
+    from advancedFeatures import AdvancedFeatures
+    return AdvancedFeatures(get_transaction_manager())
@@ -0,0 +1,282 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+from instrumentation import timed, add_bytes
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows: locking becomes a no-op
+    fcntl = None
+
+Data = Union[str, bytes]
+Signature = Optional[Tuple[int, int, int]]
+
+LOCK_FILE = "pfm.lock"   # one advisory lock guards every data file in the directory
+
+
+class WriteStats:
+    """Counters for the shared persistence layer"""
+
+    def __init__(self):
+        self.requested = 0        # writes asked for by the managers
+        self.performed = 0        # writes that reached the disk
+        self.bytes_requested = 0
+        self.bytes_written = 0
+
+    @property
+    def saved(self) -> int:
+        return self.requested - self.performed
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_requested - self.bytes_written
+
+    def __sub__(self, other: "WriteStats") -> "WriteStats":
+        """The writes made between a copy() (other) and now"""
+        delta = WriteStats()
+        for name in ("requested", "performed", "bytes_requested", "bytes_written"):
+            setattr(delta, name, getattr(self, name) - getattr(other, name))
+        return delta
+
+    def copy(self) -> "WriteStats":
+        snapshot = WriteStats()
+        snapshot.__dict__.update(self.__dict__)
+        return snapshot
+
+    def __str__(self) -> str:
+        return (f"{self.performed} of {self.requested} writes performed "
+                f"({self.saved} coalesced), {self.bytes_written:,} bytes written "
+                f"({self.bytes_saved:,} bytes saved)")
+
+
+stats = WriteStats()
+
+
+class UnitOfWork:
+    """Pending file operations, committed once per file when the unit ends.
+
+    A later rewrite of the same file replaces the pending one and appends to
+    the same file are concatenated into a single write. Commit order is
+    rewrites, then removals, then appends, so a journal can be folded into a
+    snapshot and started afresh within one unit. Callbacks registered with
+    after_commit run last.
+    """
+
+    def __init__(self):
+        self.rewrites: Dict[str, bytes] = {}
+        self.removals: Set[str] = set()
+        self.appends: Dict[str, List[bytes]] = {}
+        self.callbacks: List[Callable[[], None]] = []
+
+    def commit(self) -> None:
+        rewrites, removals, appends = self.rewrites, self.removals, self.appends
+        callbacks, self.callbacks = self.callbacks, []
+        self.rewrites, self.removals, self.appends = {}, set(), {}
+        for path, data in rewrites.items():
+            _atomic_write(path, data)
+        for path in removals:
+            _remove(path)
+        for path, chunks in appends.items():
+            _append(path, b"".join(chunks), durable=True)
+        for callback in callbacks:
+            callback()
+
+
+_active: Optional[UnitOfWork] = None
+_written: Dict[str, Signature] = {}   # signature each file had after our own last write
+_NOT_WRITTEN = object()
+
+
+def _encode(data: Data) -> bytes:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+@timed("persistence.atomic_write")
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write to a temp file in the same directory, fsync it, then rename over path.
+
+    Readers see either the old or the new contents, never a truncated file.
+    """
+    import tempfile   # deferred: read-only commands never need it
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    _record(path)
+    add_bytes(path, len(data))
+    stats.performed += 1
+    stats.bytes_written += len(data)
+
+
+@timed("persistence.append")
+def _append(path: str, data: bytes, durable: bool) -> None:
+    with open(path, "ab") as f:
+        f.write(data)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    _record(path)
+    add_bytes(path, len(data))
+    stats.performed += 1
+    stats.bytes_written += len(data)
+
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+    _record(path)
+
+
+def _record(path: str) -> None:
+    _written[os.path.abspath(path)] = signature(path)
+
+
+# ---------- Change detection ----------
+def signature(path: str) -> Signature:
+    """(inode, size, mtime) of a file, or None if it does not exist.
+
+    Atomic rewrites always get a new inode and appends change the size, so
+    this catches changes even where mtime is coarse.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ChangeTracker:
+    """Tells whether another process changed a set of files since mark().
+
+    Changes this process made through write_file/append_file/remove_file are
+    not reported, so callers only reload for foreign writes.
+    """
+
+    def __init__(self, *paths: str):
+        self.paths = paths
+        self._seen: Dict[str, Signature] = {}
+        self.mark()
+
+    def mark(self) -> None:
+        """Record the current state; call before reading the files"""
+        self._seen = {path: signature(path) for path in self.paths}
+
+    def changed(self) -> bool:
+        changed = False
+        for path in self.paths:
+            current = signature(path)
+            if current != self._seen.get(path):
+                ours = _written.get(os.path.abspath(path), _NOT_WRITTEN)
+                changed = changed or current != ours
+                self._seen[path] = current
+        return changed
+
+
+# ---------- Locking ----------
+_lock = threading.RLock()
+_lock_depth = 0
+_lock_handle = None
+
+
+@contextmanager
+def locked(path: str = LOCK_FILE) -> Iterator[None]:
+    """Hold the exclusive advisory lock for the block.
+
+    Re-entrant within a process, so managers can nest read-modify-write
+    cycles freely. Without fcntl only threads of this process are excluded.
+    """
+    global _lock_depth, _lock_handle
+    with _lock:
+        if _lock_depth == 0 and fcntl is not None:
+            _lock_handle = open(path, "a")
+            fcntl.flock(_lock_handle.fileno(), fcntl.LOCK_EX)
+        _lock_depth += 1
+        try:
+            yield
+        finally:
+            _lock_depth -= 1
+            if _lock_depth == 0 and _lock_handle is not None:
+                fcntl.flock(_lock_handle.fileno(), fcntl.LOCK_UN)
+                _lock_handle.close()
+                _lock_handle = None
+
+
+# The functions below raise OSError; callers wrap it in their own error types.
+
+def write_file(path: str, data: Data) -> None:
+    """Replace a file's contents atomically (deferred inside a unit of work)"""
+    data = _encode(data)
+    stats.requested += 1
+    stats.bytes_requested += len(data)
+    if _active is not None:
+        _active.removals.discard(path)
+        _active.rewrites[path] = data
+    else:
+        _atomic_write(path, data)
+
+
+def append_file(path: str, data: Data, durable: bool = True) -> None:
+    """Append to a file; inside a unit of work appends are batched and fsynced once"""
+    data = _encode(data)
+    stats.requested += 1
+    stats.bytes_requested += len(data)
+    if _active is not None:
+        if path in _active.rewrites:
+            # Keep ordering simple: fold the append into the pending rewrite
+            _active.rewrites[path] += data
+        else:
+            _active.appends.setdefault(path, []).append(data)
+    else:
+        _append(path, data, durable)
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """Run callback once the writes so far are on disk: at the end of the
+    current unit of work (still under its lock), or now if there is none"""
+    if _active is not None:
+        _active.callbacks.append(callback)
+    else:
+        callback()
+
+
+def remove_file(path: str) -> None:
+    """Delete a file; inside a unit of work, queued writes to it are dropped too"""
+    if _active is not None:
+        _active.rewrites.pop(path, None)
+        _active.appends.pop(path, None)
+        _active.removals.add(path)
+    else:
+        _remove(path)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Coalesce every write made inside the block into one flush per file.
+
+    Nested blocks join the outermost one. The lock is held until the writes
+    are committed, and they are committed even if the block raises, because
+    in-memory state has already changed.
+    """
+    global _active
+    if _active is not None:
+        yield _active
+        return
+    with locked():
+        _active = unit = UnitOfWork()
+        try:
+            yield unit
+        finally:
+            _active = None
+            unit.commit()
@@ -0,0 +1,112 @@
+import calendar
+import heapq
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+DAY_FORMAT = "%Y-%m-%d"
+
+QueueItem = Tuple[str, str, int]   # (next_date, username, schedule id)
+
+
+def add_months(start: date, months: int, anchor_day: int) -> date:
+    """Move `months` calendar months forward, landing on anchor_day or the month's last day"""
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(current: date, frequency: str, anchor_day: int) -> date:
+    if frequency == "daily":
+        return current + timedelta(days=1)
+    if frequency == "weekly":
+        return current + timedelta(weeks=1)
+    if frequency == "monthly":
+        return add_months(current, 1, anchor_day)
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+
+def anchor_day(entry: Dict) -> int:
+    """Day of month a monthly schedule aims for (31 keeps it on month ends)"""
+    return int(entry.get("day") or datetime.strptime(entry["next_date"], DAY_FORMAT).day)
+
+
+def due_occurrences(entry: Dict, today: date) -> Tuple[List[date], date]:
+    """Every occurrence from entry["next_date"] through today, plus the one after.
+
+    Unknown frequencies yield nothing so a bad entry cannot loop forever.
+    """
+    current = datetime.strptime(entry["next_date"], DAY_FORMAT).date()
+    frequency = entry.get("frequency", "")
+    if frequency not in FREQUENCIES:
+        return [], current
+    day = anchor_day(entry)
+    due = []
+    while current <= today:
+        due.append(current)
+        current = next_occurrence(current, frequency, day)
+    return due, current
+
+
+def assign_ids(entries: List[Dict]) -> bool:
+    """Give each of a user's schedules a stable "id" (schedules saved before
+    ids existed get one here); True if any entry changed"""
+    next_id = max((entry.get("id", 0) for entry in entries), default=0) + 1
+    changed = False
+    for entry in entries:
+        if not entry.get("id"):
+            entry["id"] = next_id
+            next_id += 1
+            changed = True
+    return changed
+
+
+class RecurringScheduler:
+    """Min-heap of (next_date, username, schedule id) across every user's schedules.
+
+    Built from the schedules themselves (an O(N) heapify) whenever they are
+    loaded; each pop or push is O(log N). Items are keyed by the schedule's
+    id, not its position, so removed or reordered schedules cannot be
+    confused. Items may go stale when a schedule is advanced elsewhere (a
+    single-user run); pop_due re-checks each item against its entry and
+    re-queues it if it moved.
+    """
+
+    def __init__(self, recurring: Dict[str, List[Dict]]):
+        self._entries: Dict[Tuple[str, int], Dict] = {
+            (username, entry["id"]): entry
+            for username, entries in recurring.items()
+            for entry in entries
+        }
+        self._heap: List[QueueItem] = [
+            (entry["next_date"], username, schedule_id)
+            for (username, schedule_id), entry in self._entries.items()
+            if entry.get("frequency") in FREQUENCIES
+        ]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, username: str, entry: Dict) -> None:
+        self._entries[(username, entry["id"])] = entry
+        if entry.get("frequency") in FREQUENCIES:
+            heapq.heappush(self._heap, (entry["next_date"], username, entry["id"]))
+
+    def pop_due(self, today: date) -> Iterator[Tuple[str, Dict]]:
+        """Yield (username, entry) for each schedule due on or before today.
+
+        Callers advance the entry and push it back; dates are zero-padded
+        YYYY-MM-DD strings, so string order is date order.
+        """
+        cutoff = today.strftime(DAY_FORMAT)
+        while self._heap and self._heap[0][0] <= cutoff:
+            queued_date, username, schedule_id = heapq.heappop(self._heap)
+            entry = self._entries.get((username, schedule_id))
+            if entry is None:
+                continue
+            if entry["next_date"] != queued_date:
+                self.push(username, entry)
+                continue
+            yield username, entry
@@ -1,11 +1,21 @@
-import json
-import os
-from datetime import datetime
-from typing import Dict
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
 from transactions import TransactionManager
+from aggregates import UserAggregates, to_cents
+from results import (
+    BudgetStatus, DashboardSummary, MonthlyReport, SavingsGoal, Totals, TrendReport, TrendRow, to_decimal
+)
+from utils import DataValidationError, parse_month
+from persistence import locked
+from instrumentation import timed
 
 
 BUDGET_FILE = "budgets.json"
+TREND_GROUPS = ("month", "week", "category")
+REPORTS = ("dashboard", "monthly", "categories", "health", "budget")
+MONTHLY_REPORTS = ("monthly", "budget")   # the reports that need a month
+SPARK_LEVELS = "▁▂▃▄▅▆▇█"
 
 
 class ReportsManager:
@@ -13,74 +23,57 @@ class ReportsManager:
         self.transaction_manager = transaction_manager
         self.budgets = self._load_budgets()
 
+    def _aggregates(self, username: str) -> UserAggregates:
+        return self.transaction_manager.get_user_aggregates(username)
 
     def _load_budgets(self) -> Dict[str, Dict]:
-        if os.path.exists(BUDGET_FILE):
-            try:
-                with open(BUDGET_FILE, "r") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        return self.transaction_manager.storage.load_document(BUDGET_FILE)
 
     def _save_budgets(self):
-    
-        with open(BUDGET_FILE, "w") as f:
-            json.dump(self.budgets, f, indent=4)
-
-    def set_monthly_budget(self, username: str, month: str, limit: float):
-        
-        if username not in self.budgets:
-            self.budgets[username] = {}
-        self.budgets[username][month] = {"limit": limit}
-        self._save_budgets()
-        print(f" Budget for {month} set to ${limit:,.2f}")
-
-    def budget_status(self, username: str, month: str) -> Dict[str, float]:
-        budget = self.budgets.get(username, {}).get(month)
-        if not budget:
-            return {"message": f"No budget set for {month}. Please set one first."}
-
-        transactions = self.transaction_manager.get_user_transactions(username)
-        expenses = sum(
-            t["amount"] for t in transactions
-            if t["type"] == "expense" and t["date"].startswith(month)
-        )
+        self.transaction_manager.storage.save_document(BUDGET_FILE, self.budgets)
 
-        limit = budget["limit"]
-        remaining = limit - expenses
-        percent_used = min(100, round((expenses / limit) * 100, 2)) if limit > 0 else 0
+    def _reload_budgets(self):
+        """Re-read budgets only if another process saved them since"""
+        if self.transaction_manager.storage.changed(BUDGET_FILE):
+            self.budgets = self._load_budgets()
 
-        status = {
-            "Month": month,
-            "Budget Limit": f"${limit:,.2f}",
-            "Expenses": f"${expenses:,.2f}",
-            "Remaining": f"${remaining:,.2f}",
-            "Used (%)": f"{percent_used}%",
-        }
-
-        if expenses > limit:
-            status["Warning"] = "You have exceeded your monthly budget!"
-        elif percent_used >= 90:
-            status["Caution"] = "You are close to exceeding your budget."
-        else:
-            status["Status"] = "You are within your budget."
+    @timed()
+    def set_monthly_budget(self, username: str, month: str, limit: float) -> Dict:
+        """Set the user's budget for a month; returns the stored month and limit"""
+        month = parse_month(month)
+        with locked():
+            self._reload_budgets()
+            if username not in self.budgets:
+                self.budgets[username] = {}
+            self.budgets[username][month] = {"limit": limit}
+            self._save_budgets()
+        return {"month": month, "limit": limit}
 
-        return status
+    @timed()
+    def budget_status(self, username: str, month: str) -> Optional[BudgetStatus]:
+        """Spending against the month's budget, or None if no budget is set"""
+        month = parse_month(month)
+        self._reload_budgets()
+        budget = self.budgets.get(username, {}).get(month)
+        if not budget:
+            return None
+        expenses = self._aggregates(username).month_totals(month).expense_cents
+        return BudgetStatus(month, to_cents(budget["limit"]), expenses)
 
+    @timed()
     def calculate_health_score(self, username: str) -> Dict[str, float]:
        
-        txns = self.transaction_manager.get_user_transactions(username)
-        if not txns:
+        totals = self._aggregates(username)
+        if not totals.count:
             return {"score": 0, "message": "No transactions available yet."}
 
-        income = sum(t["amount"] for t in txns if t["type"] == "income")
-        expenses = sum(t["amount"] for t in txns if t["type"] == "expense")
+        income = totals.total("income")
+        expenses = totals.total("expense")
         if income == 0:
             return {"score": 30, "message": "No income recorded — please add income transactions."}
 
         savings_ratio = max(0, (income - expenses) / income)  # higher = better
-        expense_count = sum(1 for t in txns if t["type"] == "expense")
+        expense_count = totals.type_count("expense")
         avg_expense = expenses / expense_count if expense_count > 0 else 0
 
         score = (
@@ -104,45 +97,229 @@ class ReportsManager:
 
         return {"score": score, "message": note}
 
+    def report(self, username: str, name: str, month: Optional[str] = None):
+        """One of REPORTS as JSON-ready data, for the CLI and the server"""
+        if name not in REPORTS:
+            raise DataValidationError(f"No report {name!r} (expected one of {', '.join(REPORTS)})")
+        if name in MONTHLY_REPORTS and not month:
+            raise DataValidationError(f"The {name} report needs a month (YYYY-MM)")
+        if name == "dashboard":
+            return self.dashboard_summary(username).to_dict()
+        if name == "monthly":
+            return self.monthly_report(username, month).to_dict()
+        if name == "categories":
+            return self.category_breakdown(username)
+        if name == "health":
+            return self.calculate_health_score(username)
+        status = self.budget_status(username, month)
+        return status.to_dict() if status else None
+
     # -----------------------------
     # Existing Reports
     # -----------------------------
-    def dashboard_summary(self, username: str) -> Dict[str, float]:
-        txns = self.transaction_manager.get_user_transactions(username)
-        income = sum(t["amount"] for t in txns if t["type"] == "income")
-        expenses = sum(t["amount"] for t in txns if t["type"] == "expense")
-        return {
-            "Total Income": f"${income:,.2f}",
-            "Total Expenses": f"${expenses:,.2f}",
-            "Net Balance": f"${(income - expenses):,.2f}"
-        }
+    @timed()
+    def dashboard_summary(self, username: str) -> DashboardSummary:
+        return DashboardSummary(self._aggregates(username).overall())
 
+    @timed()
     def category_breakdown(self, username: str) -> Dict[str, float]:
-        txns = self.transaction_manager.get_user_transactions(username)
-        summary = {}
-        for t in txns:
-            if t["type"] == "expense":
-                summary[t["category"]] = summary.get(t["category"], 0) + t["amount"]
-        return dict(sorted(summary.items(), key=lambda x: x[1], reverse=True))
-
-    def monthly_report(self, username: str, month: str) -> Dict[str, float]:
-        txns = self.transaction_manager.get_user_transactions(username)
-        month_txns = [t for t in txns if t["date"].startswith(month)]
-        income = sum(t["amount"] for t in month_txns if t["type"] == "income")
-        expense = sum(t["amount"] for t in month_txns if t["type"] == "expense")
-        return {
-            "Month": month,
-            "Income": f"${income:,.2f}",
-            "Expense": f"${expense:,.2f}",
-            "Balance": f"${(income - expense):,.2f}",
-            "Transaction Count": len(month_txns)
-        }
+        return self._aggregates(username).category_totals()
 
-  
-    def print_report(self, title: str, data: Dict):
+    @timed()
+    def monthly_report(self, username: str, month: str) -> MonthlyReport:
+        month = parse_month(month)
+        return MonthlyReport(month, self._aggregates(username).month_totals(month))
+
+    @timed()
+    def trend_report(self, username: str, start_month: str, end_month: str,
+                     group_by: str = "month") -> TrendReport:
+        """Totals per month, ISO week or category from start_month to end_month
+        (inclusive), each with the period before it for period-over-period change.
+
+        Months come straight from the aggregates' month table. Weeks and
+        categories take one pass over the user's date-ordered transactions.
+        Weeks run Monday to Sunday, so the first and last may reach past
+        the months' edges; the first is compared with the week before it.
+        Categories are compared with the same number of months just before
+        start_month.
+        """
+        start_month = parse_month(start_month)
+        end_month = parse_month(end_month)
+        if start_month > end_month:
+            raise DataValidationError(f"Start month {start_month} is after end month {end_month}")
+        if group_by not in TREND_GROUPS:
+            raise DataValidationError(f"Invalid grouping: {group_by!r} (expected month, week or category)")
+
+        months = _month_range(start_month, end_month)
+        if group_by == "month":
+            aggregates = self._aggregates(username)
+            periods = [(month, aggregates.month_totals(month))
+                       for month in [_shift_month(start_month, -1)] + months]
+            rows = [TrendRow(label, totals, previous)
+                    for (_, previous), (label, totals) in zip(periods, periods[1:])]
+
+        elif group_by == "week":
+            first = _month_start(start_month)
+            last = _month_start(_shift_month(end_month, 1)) - timedelta(days=1)
+            monday = first - timedelta(days=first.weekday() + 7)    # the week before, too
+            sunday = last + timedelta(days=6 - last.weekday())
+            buckets = self._bucket(username, monday, sunday, lambda day, t: _week_label(day))
+            labels = [_week_label(monday + timedelta(days=day)) for day in range(0, (sunday - monday).days, 7)]
+            periods = [buckets.get(label, Totals()) for label in labels]
+            rows = [TrendRow(label, totals, previous)
+                    for label, previous, totals in zip(labels[1:], periods, periods[1:])]
+
+        else:
+            previous_start = _shift_month(start_month, -len(months))
+            last = _month_start(_shift_month(end_month, 1)) - timedelta(days=1)
+            buckets = self._bucket(
+                username, _month_start(previous_start), last,
+                lambda day, t: (str(t["date"])[:7] >= start_month, t["category"] or "Uncategorized"),
+            )
+            categories = {category for _, category in buckets}
+            rows = [TrendRow(category, buckets.get((True, category), Totals()),
+                             buckets.get((False, category), Totals()))
+                    for category in categories]
+            rows.sort(key=lambda row: (-(row.totals.expense_cents + row.totals.income_cents), row.period))
+
+        return TrendReport(group_by, start_month, end_month, tuple(rows))
+
+    def _bucket(self, username: str, first: date, last: date,
+                key: Callable) -> Dict[object, Totals]:
+        """One pass over the user's transactions dated first..last (inclusive),
+        summed per key(day, transaction)"""
+        rows = self.transaction_manager.search_transactions(
+            username, start_date=first.isoformat(), end_date=last.isoformat()
+        )
+        sums: Dict[object, List[int]] = {}
+        days: Dict[str, date] = {}
+        for t in rows:
+            text = str(t["date"])[:10]
+            day = days.get(text)
+            if day is None:
+                day = days[text] = date(int(text[0:4]), int(text[5:7]), int(text[8:10]))
+            bucket = sums.setdefault(key(day, t), [0, 0, 0])
+            if t["type"] == "income":
+                bucket[0] += to_cents(t["amount"])
+            elif t["type"] == "expense":
+                bucket[1] += to_cents(t["amount"])
+            bucket[2] += 1
+        return {name: Totals(*values) for name, values in sums.items()}
+
+    def print_report(self, title: str, data):
+        """Print a report result (or a plain dict) as a two-column table"""
         print("\n" + "=" * 60)
         print(title.center(60))
         print("=" * 60)
-        for key, value in data.items():
+        for key, value in report_rows(data).items():
             print(f"{key:<25}: {value}")
-        print("=" * 60)
\ No newline at end of file
+        print("=" * 60)
+
+
+# ---------- Periods ----------
+def _month_start(month: str) -> date:
+    return date(int(month[:4]), int(month[5:7]), 1)
+
+
+def _shift_month(month: str, offset: int) -> str:
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + offset
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _month_range(start: str, end: str) -> List[str]:
+    months = [start]
+    while months[-1] < end:
+        months.append(_shift_month(months[-1], 1))
+    return months
+
+
+@lru_cache(maxsize=4096)
+def _week_label(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+# ---------- Formatting ----------
+def money(cents: int) -> str:
+    return f"${to_decimal(cents):,.2f}"
+
+
+def report_rows(data) -> Dict[str, object]:
+    """Display labels and formatted values for a report result"""
+    if isinstance(data, DashboardSummary):
+        return {
+            "Total Income": money(data.totals.income_cents),
+            "Total Expenses": money(data.totals.expense_cents),
+            "Net Balance": money(data.totals.net_cents),
+        }
+    if isinstance(data, MonthlyReport):
+        return {
+            "Month": data.month,
+            "Income": money(data.totals.income_cents),
+            "Expense": money(data.totals.expense_cents),
+            "Balance": money(data.totals.net_cents),
+            "Transaction Count": data.totals.count,
+        }
+    if isinstance(data, BudgetStatus):
+        rows = {
+            "Month": data.month,
+            "Budget Limit": money(data.limit_cents),
+            "Expenses": money(data.expense_cents),
+            "Remaining": money(data.remaining_cents),
+            "Used (%)": f"{data.used_percent}%",
+        }
+        if data.status == "exceeded":
+            rows["Warning"] = "You have exceeded your monthly budget!"
+        elif data.status == "caution":
+            rows["Caution"] = "You are close to exceeding your budget."
+        else:
+            rows["Status"] = "You are within your budget."
+        return rows
+    if isinstance(data, list) and all(isinstance(goal, SavingsGoal) for goal in data):
+        return {
+            goal.name: f"{money(goal.saved_cents)} of {money(goal.target_cents)} ({goal.progress_percent:.1f}%)"
+            for goal in data
+        }
+    return data
+
+
+def signed_money(cents: int) -> str:
+    return f"{'-' if cents < 0 else '+'}${to_decimal(abs(cents)):,.2f}"
+
+
+def trend_table(report: TrendReport) -> str:
+    """A TrendReport as a text table with the change in net per row"""
+    def line(label: str, totals: Totals, change: str) -> str:
+        return (f"{label:<16} {money(totals.income_cents):>13} {money(totals.expense_cents):>13} "
+                f"{money(totals.net_cents):>13} {totals.count:>6} {change:>14}")
+
+    lines = [f"{report.group_by:<16} {'income':>13} {'expense':>13} {'net':>13} {'count':>6} {'change in net':>14}"]
+    lines.extend(line(row.period, row.totals, signed_money(row.change.net_cents)) for row in report.rows)
+    lines.append(line("total", report.total, ""))
+    return "\n".join(lines)
+
+
+def sparkline(values: List[int]) -> str:
+    """One block character per value, scaled between the smallest and largest"""
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    if high == low:
+        return SPARK_LEVELS[len(SPARK_LEVELS) // 2] * len(values)
+    top = len(SPARK_LEVELS) - 1
+    return "".join(SPARK_LEVELS[round((value - low) / (high - low) * top)] for value in values)
+
+
+def trend_chart(report: TrendReport) -> str:
+    """Sparklines of income, expense and net across the report's periods"""
+    rows = report.rows
+    if not rows:
+        return "(no periods)"
+    lines = [f"by {report.group_by}: {rows[0].period} .. {rows[-1].period}"]
+    for label, values in (
+        ("income", [row.totals.income_cents for row in rows]),
+        ("expense", [row.totals.expense_cents for row in rows]),
+        ("net", [row.totals.net_cents for row in rows]),
+    ):
+        lines.append(f"{label:<8} {sparkline(values)}  {money(min(values))} .. {money(max(values))}")
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+"""Typed report results in integer cents.
+
+The managers return these instead of display strings; formatting happens
+only in reports.print_report (text) and to_dict() (JSON-ready numbers).
+They are frozen, so they can be cached and compared, and totals add up
+exactly, e.g. sum(reports, Totals()) for a multi-month or multi-user rollup.
+
+__slots__ is spelled out because dataclass(slots=True) needs Python 3.10.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Tuple
+
+CAUTION_PERCENT = 90   # budget use from which status is "caution"
+
+
+def to_decimal(cents: int) -> Decimal:
+    """Exact currency amount for cents"""
+    return Decimal(cents).scaleb(-2)
+
+
+class _Slotted:
+    """Pickle support for frozen slotted dataclasses (the default
+    __setstate__ assigns attributes, which a frozen class refuses)"""
+    __slots__ = ()
+
+    def __getstate__(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+
+@dataclass(frozen=True)
+class Totals(_Slotted):
+    """Income, expenses and transaction count over any span"""
+    __slots__ = ("income_cents", "expense_cents", "count")
+    income_cents: int
+    expense_cents: int
+    count: int
+
+    def __init__(self, income_cents: int = 0, expense_cents: int = 0, count: int = 0):
+        object.__setattr__(self, "income_cents", income_cents)
+        object.__setattr__(self, "expense_cents", expense_cents)
+        object.__setattr__(self, "count", count)
+
+    @property
+    def net_cents(self) -> int:
+        return self.income_cents - self.expense_cents
+
+    @property
+    def income(self) -> Decimal:
+        return to_decimal(self.income_cents)
+
+    @property
+    def expenses(self) -> Decimal:
+        return to_decimal(self.expense_cents)
+
+    @property
+    def net(self) -> Decimal:
+        return to_decimal(self.net_cents)
+
+    def __add__(self, other: "Totals") -> "Totals":
+        if not isinstance(other, Totals):
+            return NotImplemented
+        return Totals(self.income_cents + other.income_cents,
+                      self.expense_cents + other.expense_cents,
+                      self.count + other.count)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: "Totals") -> "Totals":
+        """The change from other to self"""
+        if not isinstance(other, Totals):
+            return NotImplemented
+        return Totals(self.income_cents - other.income_cents,
+                      self.expense_cents - other.expense_cents,
+                      self.count - other.count)
+
+    def to_dict(self) -> Dict:
+        return {
+            "income": self.income_cents / 100,
+            "expenses": self.expense_cents / 100,
+            "net_balance": self.net_cents / 100,
+            "count": self.count,
+        }
+
+
+@dataclass(frozen=True)
+class DashboardSummary(_Slotted):
+    """All-time totals for one user"""
+    __slots__ = ("totals",)
+    totals: Totals
+
+    def to_dict(self) -> Dict:
+        return self.totals.to_dict()
+
+
+@dataclass(frozen=True)
+class MonthlyReport(_Slotted):
+    __slots__ = ("month", "totals")
+    month: str
+    totals: Totals
+
+    def to_dict(self) -> Dict:
+        return dict(month=self.month, **self.totals.to_dict())
+
+
+@dataclass(frozen=True)
+class BudgetStatus(_Slotted):
+    __slots__ = ("month", "limit_cents", "expense_cents")
+    month: str
+    limit_cents: int
+    expense_cents: int
+
+    @property
+    def remaining_cents(self) -> int:
+        return self.limit_cents - self.expense_cents
+
+    @property
+    def used_percent(self) -> float:
+        """Share of the limit spent, capped at 100"""
+        if self.limit_cents <= 0:
+            return 0
+        return min(100, round(self.expense_cents / self.limit_cents * 100, 2))
+
+    @property
+    def status(self) -> str:
+        """One of exceeded, caution (CAUTION_PERCENT or more used) or ok"""
+        if self.expense_cents > self.limit_cents:
+            return "exceeded"
+        if self.used_percent >= CAUTION_PERCENT:
+            return "caution"
+        return "ok"
+
+    def to_dict(self) -> Dict:
+        return {
+            "month": self.month,
+            "limit": self.limit_cents / 100,
+            "expenses": self.expense_cents / 100,
+            "remaining": self.remaining_cents / 100,
+            "used_percent": self.used_percent,
+            "status": self.status,
+        }
+
+
+@dataclass(frozen=True)
+class SavingsGoal(_Slotted):
+    __slots__ = ("name", "target_cents", "saved_cents")
+    name: str
+    target_cents: int
+    saved_cents: int
+
+    @property
+    def progress_percent(self) -> float:
+        if self.target_cents <= 0:
+            return 0
+        return round(self.saved_cents / self.target_cents * 100, 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "target": self.target_cents / 100,
+            "saved": self.saved_cents / 100,
+            "progress_percent": self.progress_percent,
+        }
+
+
+@dataclass(frozen=True)
+class TrendRow(_Slotted):
+    """One period (a month, an ISO week or a category) and the period before it"""
+    __slots__ = ("period", "totals", "previous")
+    period: str
+    totals: Totals
+    previous: Totals
+
+    @property
+    def change(self) -> Totals:
+        return self.totals - self.previous
+
+    def to_dict(self) -> Dict:
+        return dict(period=self.period, **self.totals.to_dict(), change=self.change.to_dict())
+
+
+@dataclass(frozen=True)
+class TrendReport(_Slotted):
+    __slots__ = ("group_by", "start_month", "end_month", "rows")
+    group_by: str
+    start_month: str
+    end_month: str
+    rows: Tuple[TrendRow, ...]
+
+    @property
+    def total(self) -> Totals:
+        return sum((row.totals for row in self.rows), Totals())
+
+    def to_dict(self) -> Dict:
+        return {
+            "group_by": self.group_by,
+            "start_month": self.start_month,
+            "end_month": self.end_month,
+            "rows": [row.to_dict() for row in self.rows],
+            "total": self.total.to_dict(),
+        }
@@ -0,0 +1,358 @@
+"""Local HTTP API over one shared, in-memory copy of the finance data.
+
+    python server.py                        # http://127.0.0.1:8765
+    python server.py --port 9000 --batch-delay 5
+
+Every request is handled on one asyncio event loop, so the managers never
+see two requests at once and need no locking beyond what they already do
+against other processes. Reads are answered from memory as they arrive,
+interleaved across any number of open connections. Writes are queued and
+applied in batches (after --batch-delay ms, or as soon as BATCH_SIZE are
+waiting) inside one unit_of_work, so a burst of writes costs one flush per
+file; each write is answered once its batch is on disk. bcrypt runs on the
+hashing pool, so registrations and logins do not stall the loop.
+
+POST /login {"username": ..., "password": ...} returns a token; send it as
+"Authorization: Bearer <token>" on every other request. Request and
+response bodies are JSON with plain numbers, as with main.py --json.
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from managers import get_user_manager, get_transaction_manager, get_reports_manager, get_advanced_features
+from persistence import unit_of_work
+from reports import REPORTS
+from utils import DataError, DataValidationError, parse_amount, parse_month, validate_transaction
+
+HOST = "127.0.0.1"
+PORT = 8765
+BATCH_DELAY_MS = 2.0      # how long a write waits for others to share its flush
+BATCH_SIZE = 500          # apply a batch at once when this many writes are waiting
+MAX_BODY = 1 << 20
+REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+    404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """A request failure with its HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method: str, path: str, query: Dict[str, str],
+                 headers: Dict[str, str], body: bytes, params: Tuple[str, ...]):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.params = params       # groups captured from the route pattern
+        self.user: Optional[str] = None
+
+    def json(self) -> Dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return data
+
+
+class WriteBatcher:
+    """Queue writes from many requests and apply them in one unit of work"""
+
+    def __init__(self, delay: float = BATCH_DELAY_MS / 1000, size: int = BATCH_SIZE):
+        self.delay = delay
+        self.size = size
+        self.batches = 0
+        self.writes = 0
+        self._pending: List[Tuple[Callable, tuple, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def submit(self, fn: Callable, *args) -> "asyncio.Future":
+        """Schedule fn(*args); the future resolves once its batch is committed"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((fn, args, future))
+        if len(self._pending) >= self.size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self.flush)
+        return future
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        outcomes = []
+        try:
+            with unit_of_work():
+                for fn, args, future in pending:
+                    try:
+                        outcomes.append((future, fn(*args), None))
+                    except Exception as e:   # fails this write only
+                        outcomes.append((future, None, e))
+        except (DataError, OSError) as e:
+            # The commit failed, so no write in the batch can be acknowledged
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += len(pending)
+        for future, result, error in outcomes:
+            if future.done():        # the client went away
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class FinanceServer:
+    def __init__(self, batcher: Optional[WriteBatcher] = None):
+        self.batcher = batcher or WriteBatcher()
+        self.users = get_user_manager()
+        self.transactions = get_transaction_manager()
+        self.reports = get_reports_manager()
+        self.features = get_advanced_features()
+
+    # ---------- Accounts ----------
+    async def register(self, request: Request) -> Tuple[int, object]:
+        body = request.json()
+        username = str(body.get("username") or "")
+        ok, message = await self.users.register_user_async(username, str(body.get("password") or ""))
+        if not ok:
+            raise HTTPError(400, message)
+        return 201, {"username": username}
+
+    async def login(self, request: Request) -> Tuple[int, object]:
+        body = request.json()
+        username = str(body.get("username") or "")
+        ok, message = await self.users.login_async(username, str(body.get("password") or ""))
+        if not ok:
+            raise HTTPError(401, message)
+        return 200, {"token": self.users.sessions.token_for(username)}
+
+    async def logout(self, request: Request) -> Tuple[int, object]:
+        self.users.sessions.revoke(request.user)
+        return 200, {"logged_out": request.user}
+
+    async def profile(self, request: Request) -> Tuple[int, object]:
+        return 200, self.users.get_user_profile(request.user)
+
+    def authenticate(self, headers: Dict[str, str]) -> str:
+        """The user a bearer token belongs to; logging out invalidates it"""
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        username = self.users.sessions.username(token.strip()) if scheme.lower() == "bearer" else None
+        if username is None or self.users.sessions.token_for(username) != token.strip():
+            raise HTTPError(401, "Missing, invalid or expired token")
+        return username
+
+    # ---------- Transactions ----------
+    async def search(self, request: Request) -> Tuple[int, object]:
+        query = request.query
+        return 200, self.transactions.search_transactions(
+            request.user, query.get("category"), query.get("from"), query.get("to")
+        )
+
+    async def add_transaction(self, request: Request) -> Tuple[int, object]:
+        body = request.json()
+        row = validate_transaction(dict(body, user=request.user, date=None))
+        transaction = await self.batcher.submit(
+            self.transactions.add_transaction,
+            row["user"], row["amount"], row["category"], row["description"], row["type"]
+        )
+        return 201, transaction
+
+    def _delete_owned(self, username: str, transaction_id: int) -> None:
+        transaction = self.transactions.get_transaction_by_id(transaction_id)
+        if transaction is None or transaction["user"] != username:
+            raise HTTPError(404, f"No transaction {transaction_id}")
+        self.transactions.delete_transaction(transaction_id)
+
+    async def delete_transaction(self, request: Request) -> Tuple[int, object]:
+        transaction_id = int(request.params[0])
+        await self.batcher.submit(self._delete_owned, request.user, transaction_id)
+        return 200, {"deleted": transaction_id}
+
+    # ---------- Reports and budgets ----------
+    async def report(self, request: Request) -> Tuple[int, object]:
+        name = request.params[0]
+        if name not in REPORTS:
+            raise HTTPError(404, f"No report {name!r}")
+        return 200, self.reports.report(request.user, name, request.query.get("month"))
+
+    async def set_budget(self, request: Request) -> Tuple[int, object]:
+        month = parse_month(request.params[0])
+        limit = parse_amount(request.json().get("limit"))
+        return 200, await self.batcher.submit(self.reports.set_monthly_budget, request.user, month, limit)
+
+    # ---------- Goals and recurring ----------
+    async def goals(self, request: Request) -> Tuple[int, object]:
+        return 200, [goal.to_dict() for goal in self.features.get_savings_goals(request.user)]
+
+    async def add_goal(self, request: Request) -> Tuple[int, object]:
+        body = request.json()
+        name = str(body.get("name") or "").strip()
+        if not name:
+            raise DataValidationError("Missing goal name")
+        target = parse_amount(body.get("target"))
+        goal = await self.batcher.submit(self.features.set_savings_goal, request.user, name, target)
+        return 201, goal.to_dict()
+
+    async def recurring(self, request: Request) -> Tuple[int, object]:
+        return 200, self.features.get_recurring_transactions(request.user)
+
+    async def add_recurring(self, request: Request) -> Tuple[int, object]:
+        body = request.json()
+        row = validate_transaction(dict(body, user=request.user, date=None))
+        entry = await self.batcher.submit(
+            self.features.add_recurring_transaction,
+            request.user, row["amount"], row["category"], row["description"], row["type"],
+            str(body.get("frequency") or "")
+        )
+        return 201, entry
+
+    async def run_recurring(self, request: Request) -> Tuple[int, object]:
+        created = await self.batcher.submit(self.features.process_recurring_transactions, request.user)
+        return 200, {"created": created}
+
+    # ---------- HTTP ----------
+    async def dispatch(self, method: str, target: str, headers: Dict[str, str],
+                       body: bytes) -> Tuple[int, object]:
+        url = urlsplit(target)
+        path = unquote(url.path)
+        for route_method, pattern, handler, public in ROUTES:
+            match = pattern.fullmatch(path)
+            if match and route_method == method:
+                break
+        else:
+            return 404, {"error": f"No route for {method} {path}"}
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        request = Request(method, path, query, headers, body, match.groups())
+        try:
+            if not public:
+                request.user = self.authenticate(headers)
+            return await handler(self, request)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except DataValidationError as e:
+            return 400, {"error": str(e)}
+        except DataError as e:
+            return 500, {"error": str(e)}
+        except Exception:
+            traceback.print_exc()
+            return 500, {"error": "Internal server error"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one connection, keeping it open between requests (HTTP/1.1)"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.split(" ")
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                status, payload = await self.dispatch(method, target, headers, body)
+                await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+# (method, path pattern, handler, public)
+ROUTES = [
+    ("POST", r"/register", FinanceServer.register, True),
+    ("POST", r"/login", FinanceServer.login, True),
+    ("POST", r"/logout", FinanceServer.logout, False),
+    ("GET", r"/profile", FinanceServer.profile, False),
+    ("GET", r"/transactions", FinanceServer.search, False),
+    ("POST", r"/transactions", FinanceServer.add_transaction, False),
+    ("DELETE", r"/transactions/(\d+)", FinanceServer.delete_transaction, False),
+    ("GET", r"/reports/([a-z]+)", FinanceServer.report, False),
+    ("PUT", r"/budgets/([^/]+)", FinanceServer.set_budget, False),
+    ("GET", r"/goals", FinanceServer.goals, False),
+    ("POST", r"/goals", FinanceServer.add_goal, False),
+    ("GET", r"/recurring", FinanceServer.recurring, False),
+    ("POST", r"/recurring", FinanceServer.add_recurring, False),
+    ("POST", r"/recurring/run", FinanceServer.run_recurring, False),
+]
+ROUTES = [(method, re.compile(pattern), handler, public) for method, pattern, handler, public in ROUTES]
+
+
+async def serve(host: str = HOST, port: int = PORT, batch_delay: float = BATCH_DELAY_MS) -> None:
+    app = FinanceServer(WriteBatcher(batch_delay / 1000))
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"Serving on http://{host}:{port}", file=sys.stderr, flush=True)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.batcher.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the finance data over HTTP on localhost")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--batch-delay", type=float, default=BATCH_DELAY_MS,
+                        help=f"ms a write waits to share a flush with others (default: {BATCH_DELAY_MS})")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.batch_delay))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,582 @@
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+import persistence
+from aggregates import UserAggregates
+from instrumentation import timed
+from utils import (
+    load_users, save_users, load_transactions, save_transactions,
+    load_sequence, save_sequence,
+    _normalize_transaction, TransactionJournal, TransactionOffsetIndex, parse_date,
+    FileAccessError, DataValidationError,
+    DATE_FORMAT, TRANSACTION_FIELDS, JOURNAL_COMPACT_THRESHOLD,
+    USERS_FILE, TRANSACTIONS_FILE, JOURNAL_FILE, BINARY_FILE
+)
+
+# ---------- Backend selection ----------
+STORAGE_ENV = "PFM_STORAGE"   # "file" (default) or "sqlite"
+DB_ENV = "PFM_DB"
+DB_FILE = "finance.db"
+ID_BLOCK_SIZE = 100   # ids reserved per sequence write
+
+_default_storage = None
+
+
+class Storage:
+    """Interface shared by the storage backends.
+
+    Transactions are written row by row (insert/update/delete); users and the
+    JSON documents (budgets, goals, recurring items) are keyed by file name so
+    both backends can serve the existing BUDGET_FILE/GOALS_FILE/RECURRING_FILE
+    constants unchanged.
+    """
+
+    _next_id: Optional[int] = None   # next id to hand out
+    _reserved = 0                    # persisted high-water mark
+
+    # ---------- Transactions ----------
+    def load_transactions(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def save_transactions(self, transactions: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def insert_transaction(self, transaction: Dict) -> None:
+        raise NotImplementedError
+
+    def insert_transactions(self, transactions: List[Dict]) -> None:
+        """Insert many rows; backends override this with a single write"""
+        for transaction in transactions:
+            self.insert_transaction(transaction)
+
+    def update_transaction(self, transaction_id: int, changes: Dict) -> None:
+        raise NotImplementedError
+
+    def delete_transaction(self, transaction_id: int) -> None:
+        raise NotImplementedError
+
+    def load_user_transactions(self, username: str) -> List[Dict]:
+        """One user's rows; backends override this to avoid a full load"""
+        return [t for t in self.load_transactions() if t["user"] == username]
+
+    def transaction_owner(self, transaction_id: int) -> Optional[str]:
+        """User who owns a transaction id, or None"""
+        for t in self.load_transactions():
+            if t["id"] == transaction_id:
+                return t["user"]
+        return None
+
+    def query_transactions(self, username: str, category: Optional[str] = None,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> Optional[List[Dict]]:
+        """Rows matching TransactionManager.search_transactions' filters, answered
+        by the backend itself, or None when it can only load whole users"""
+        return None
+
+    def user_aggregates(self, username: str) -> Optional[UserAggregates]:
+        """A user's totals summed by the backend itself, or None"""
+        return None
+
+    def max_transaction_id(self) -> int:
+        """Largest id present in the data (0 when empty)"""
+        return max((t["id"] for t in self.load_transactions()), default=0)
+
+    def allocate_ids(self, count: int = 1) -> int:
+        """Reserve `count` consecutive transaction ids and return the first.
+
+        Ids come from a persisted high-water mark, so a deleted id is never
+        handed out again. The mark is advanced ID_BLOCK_SIZE ids past what is
+        needed, so most calls do not write anything. Other processes reserve
+        their own blocks, so the mark is re-read whenever a new block is needed.
+        """
+        with persistence.locked():
+            if self._next_id is None or self._next_id - 1 + count > self._reserved:
+                stored = self._load_sequence()
+                if stored is None:
+                    stored = self.max_transaction_id()
+                if self._next_id is None or stored > self._reserved:
+                    # First use, or another process reserved past our block
+                    self._next_id = max(self._next_id or 0, stored + 1)
+                    self._reserved = stored
+            first = self._next_id
+            self._next_id += count
+            if self._next_id - 1 > self._reserved:
+                self._reserved = self._next_id - 1 + ID_BLOCK_SIZE
+                self._store_sequence(self._reserved)
+        return first
+
+    def ensure_sequence(self, floor: int = 0) -> None:
+        """Persist a high-water mark no lower than the largest stored id or floor
+        (e.g. the id_high_water() of the backend the data was copied from)"""
+        with persistence.locked():
+            self._reserved = max(self._load_sequence() or 0, self._reserved, self.max_transaction_id(), floor)
+            self._next_id = self._reserved + 1
+            self._store_sequence(self._reserved)
+
+    def id_high_water(self) -> int:
+        """The largest id ever handed out: the persisted mark, or the largest stored id"""
+        return max(self._load_sequence() or 0, self.max_transaction_id())
+
+    def _load_sequence(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def _store_sequence(self, value: int) -> None:
+        raise NotImplementedError
+
+    def needs_compaction(self, pending: int = 0) -> bool:
+        """True when the caller should rewrite the snapshot via save_transactions
+        rather than write `pending` more rows incrementally"""
+        return False
+
+    def sync(self) -> None:
+        """Make buffered writes durable and hand back unused reserved ids"""
+        self.release_ids()
+
+    def release_ids(self) -> None:
+        """Lower the persisted mark to the last id used, unless someone moved it since"""
+        if self._next_id is None or self._reserved <= self._next_id - 1:
+            return
+        with persistence.locked():
+            if self._load_sequence() == self._reserved:
+                self._reserved = self._next_id - 1
+                self._store_sequence(self._reserved)
+
+    # ---------- Change detection ----------
+    def watch(self, name: str) -> None:
+        """Start tracking `name` (TRANSACTIONS_FILE, USERS_FILE or a document
+        name); backends call this before their first read of it"""
+
+    def changed(self, name: str) -> bool:
+        """True if another process changed `name` since the last check.
+
+        Managers call this before using cached state and reload only when it
+        says so, holding persistence.locked() around read-modify-write cycles.
+        """
+        return False
+
+    # ---------- Users ----------
+    def load_users(self) -> Dict:
+        raise NotImplementedError
+
+    def save_users(self, users: Dict) -> None:
+        raise NotImplementedError
+
+    def save_user(self, users: Dict, username: str) -> None:
+        """Persist one user's record; backends without row writes save everything"""
+        self.save_users(users)
+
+    # ---------- JSON documents ----------
+    def load_document(self, name: str) -> Dict:
+        raise NotImplementedError
+
+    def save_document(self, name: str, data: Dict) -> None:
+        raise NotImplementedError
+
+
+class FileStorage(Storage):
+    """The original CSV/JSON files, with transaction changes journaled.
+
+    Once manage.py to-binary has written transactions.pfmb, full loads
+    (eager managers, compaction) read that instead of the CSV for as long as
+    its header names the current transactions.csv, and compaction rewrites
+    it after the new CSV is on disk. Per-user lazy loads read the CSV.
+    """
+
+    def __init__(self):
+        self.journal = TransactionJournal()
+        self._offsets: Optional[TransactionOffsetIndex] = None
+        self._trackers: Dict[str, persistence.ChangeTracker] = {}
+        self._moved = False   # a journaled update changed a row's owner
+
+    def watch(self, name: str) -> None:
+        if name not in self._trackers:
+            paths = (TRANSACTIONS_FILE, JOURNAL_FILE, BINARY_FILE) if name == TRANSACTIONS_FILE else (name,)
+            self._trackers[name] = persistence.ChangeTracker(*paths)
+
+    def changed(self, name: str) -> bool:
+        tracker = self._trackers.get(name)
+        if tracker is None or not tracker.changed():
+            return False
+        if name == TRANSACTIONS_FILE:
+            # Journal length and byte offsets describe the old files
+            self.journal.sync()
+            self.journal = TransactionJournal()
+            self._offsets = None
+        return True
+
+    def _offset_index(self) -> TransactionOffsetIndex:
+        """Build the per-user offset index on first use"""
+        if self._offsets is None:
+            self.watch(TRANSACTIONS_FILE)
+            self._offsets = TransactionOffsetIndex()
+            # Rows added since the snapshot only exist in the journal
+            for record in self.journal.read():
+                if record.get("op") == "add":
+                    row = record["row"]
+                    self._offsets.owners.setdefault(int(row["id"]), row["user"])
+        return self._offsets
+
+    def load_transactions(self) -> List[Dict]:
+        self.watch(TRANSACTIONS_FILE)
+        if not self._binary_current():
+            return load_transactions()
+        from binstore import BinaryTransactions   # deferred: it may import numpy
+        with BinaryTransactions() as binary:
+            rows = list(binary)
+        return self.journal.replay(rows)
+
+    @staticmethod
+    def _binary_current() -> bool:
+        """True if the binary file was written from transactions.csv as it is now"""
+        if not os.path.exists(BINARY_FILE):
+            return False
+        from binstore import binary_source, csv_source
+        source = csv_source(TRANSACTIONS_FILE)
+        return source is not None and binary_source(BINARY_FILE) == source
+
+    def load_user_transactions(self, username: str) -> List[Dict]:
+        return self.journal.replay(self._offset_index().load_user(username), username)
+
+    def transaction_owner(self, transaction_id: int) -> Optional[str]:
+        return self._offset_index().owners.get(transaction_id)
+
+    def max_transaction_id(self) -> int:
+        return max(self._offset_index().owners, default=0)
+
+    def _load_sequence(self) -> Optional[int]:
+        return load_sequence()
+
+    def _store_sequence(self, value: int) -> None:
+        save_sequence(value)
+
+    def save_transactions(self, transactions: List[Dict]) -> None:
+        save_transactions(transactions)
+        if os.path.exists(BINARY_FILE):
+            # Its header needs the new CSV's size and mtime, known once it is written
+            persistence.after_commit(lambda: self._refresh_binary(transactions))
+        self.journal.clear()
+        self._offsets = None
+        self._moved = False
+
+    @staticmethod
+    def _refresh_binary(transactions: List[Dict]) -> None:
+        from binstore import csv_source, write_binary
+        write_binary(transactions, BINARY_FILE, csv_source(TRANSACTIONS_FILE))
+
+    def insert_transaction(self, transaction: Dict) -> None:
+        self.journal.append("add", row={k: transaction.get(k, "") for k in TRANSACTION_FIELDS})
+        if self._offsets is not None:
+            self._offsets.owners.setdefault(int(transaction["id"]), transaction["user"])
+
+    def update_transaction(self, transaction_id: int, changes: Dict) -> None:
+        self.journal.append("update", id=transaction_id, changes=dict(changes))
+        if "user" in changes:
+            # Per-user loads read the old owner's part of the snapshot, where
+            # the new owner's replay would never find the row
+            self._moved = True
+
+    def delete_transaction(self, transaction_id: int) -> None:
+        self.journal.append("delete", id=transaction_id)
+
+    def insert_transactions(self, transactions: List[Dict]) -> None:
+        self.journal.append_many("add", [
+            {"row": {k: t.get(k, "") for k in TRANSACTION_FIELDS}} for t in transactions
+        ])
+        if self._offsets is not None:
+            for t in transactions:
+                self._offsets.owners.setdefault(int(t["id"]), t["user"])
+
+    def needs_compaction(self, pending: int = 0) -> bool:
+        return self._moved or len(self.journal) + pending >= JOURNAL_COMPACT_THRESHOLD
+
+    def sync(self) -> None:
+        self.journal.sync()
+        super().sync()
+
+    def load_users(self) -> Dict:
+        self.watch(USERS_FILE)
+        return load_users()
+
+    def save_users(self, users: Dict) -> None:
+        save_users(users)
+
+    def load_document(self, name: str) -> Dict:
+        self.watch(name)
+        if os.path.exists(name):
+            try:
+                with open(name, "r") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                return {}
+        return {}
+
+    def save_document(self, name: str, data: Dict) -> None:
+        try:
+            persistence.write_file(name, json.dumps(data, indent=4))
+        except OSError as e:
+            raise FileAccessError(f"Error saving {name}: {str(e)}")
+
+
+class SQLiteStorage(Storage):
+    """SQLite database in WAL mode with row-level writes and indexed queries"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            seq INTEGER PRIMARY KEY,
+            id INTEGER NOT NULL,
+            user TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            category TEXT NOT NULL DEFAULT '',
+            description TEXT NOT NULL DEFAULT '',
+            type TEXT NOT NULL DEFAULT '',
+            date TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_id ON transactions(id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user, date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_category
+            ON transactions(user, category COLLATE NOCASE, date);
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS documents (
+            name TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    # Legacy files may repeat an id; writes target the first row, like the in-memory index
+    FIRST_ROW = "seq = (SELECT MIN(seq) FROM transactions WHERE id = ?)"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get(DB_ENV, DB_FILE)
+        try:
+            self.conn = sqlite3.connect(self.path, isolation_level=None)
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(self.SCHEMA)
+        except sqlite3.Error as e:
+            raise FileAccessError(f"Error opening database {self.path}: {str(e)}")
+        self._versions: Dict[str, int] = {}
+
+    @timed("storage.sqlite_execute")
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        try:
+            return self.conn.execute(sql, params)
+        except sqlite3.Error as e:
+            raise FileAccessError(f"Database error: {str(e)}")
+
+    # data_version moves whenever another connection commits, whichever table it touched
+    def _data_version(self) -> int:
+        return self._execute("PRAGMA data_version").fetchone()[0]
+
+    def watch(self, name: str) -> None:
+        self._versions.setdefault(name, self._data_version())
+
+    def changed(self, name: str) -> bool:
+        if name not in self._versions:
+            return False
+        version = self._data_version()
+        changed, self._versions[name] = version != self._versions[name], version
+        return changed
+
+    @staticmethod
+    def _row_values(transaction: Dict) -> tuple:
+        return tuple(transaction.get(k, "") for k in TRANSACTION_FIELDS)
+
+    # ---------- Transactions ----------
+    def load_transactions(self) -> List[Dict]:
+        self.watch(TRANSACTIONS_FILE)
+        cursor = self._execute(f"SELECT {', '.join(TRANSACTION_FIELDS)} FROM transactions ORDER BY seq")
+        return [_normalize_transaction(dict(row)) for row in cursor]
+
+    def load_user_transactions(self, username: str) -> List[Dict]:
+        self.watch(TRANSACTIONS_FILE)
+        cursor = self._execute(
+            f"SELECT {', '.join(TRANSACTION_FIELDS)} FROM transactions WHERE user = ? ORDER BY seq",
+            (username,)
+        )
+        return [_normalize_transaction(dict(row)) for row in cursor]
+
+    def transaction_owner(self, transaction_id: int) -> Optional[str]:
+        row = self._execute(f"SELECT user FROM transactions WHERE {self.FIRST_ROW}",
+                            (transaction_id,)).fetchone()
+        return row["user"] if row else None
+
+    def max_transaction_id(self) -> int:
+        return self._execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+
+    def _load_sequence(self) -> Optional[int]:
+        row = self._execute("SELECT value FROM meta WHERE key = 'transaction_id'").fetchone()
+        return int(row["value"]) if row else None
+
+    def _store_sequence(self, value: int) -> None:
+        self._execute(
+            "INSERT INTO meta (key, value) VALUES ('transaction_id', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (value,)
+        )
+
+    def save_transactions(self, transactions: List[Dict]) -> None:
+        placeholders = ", ".join("?" for _ in TRANSACTION_FIELDS)
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute("DELETE FROM transactions")
+                self.conn.executemany(
+                    f"INSERT INTO transactions ({', '.join(TRANSACTION_FIELDS)}) VALUES ({placeholders})",
+                    (self._row_values(t) for t in transactions)
+                )
+        except sqlite3.Error as e:
+            raise FileAccessError(f"Error writing transactions to database: {str(e)}")
+
+    def insert_transaction(self, transaction: Dict) -> None:
+        placeholders = ", ".join("?" for _ in TRANSACTION_FIELDS)
+        self._execute(
+            f"INSERT INTO transactions ({', '.join(TRANSACTION_FIELDS)}) VALUES ({placeholders})",
+            self._row_values(transaction)
+        )
+
+    def insert_transactions(self, transactions: List[Dict]) -> None:
+        placeholders = ", ".join("?" for _ in TRANSACTION_FIELDS)
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    f"INSERT INTO transactions ({', '.join(TRANSACTION_FIELDS)}) VALUES ({placeholders})",
+                    (self._row_values(t) for t in transactions)
+                )
+        except sqlite3.Error as e:
+            raise FileAccessError(f"Error writing transactions to database: {str(e)}")
+
+    def update_transaction(self, transaction_id: int, changes: Dict) -> None:
+        columns = [k for k in changes if k in TRANSACTION_FIELDS]
+        if not columns:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in columns)
+        self._execute(
+            f"UPDATE transactions SET {assignments} WHERE {self.FIRST_ROW}",
+            [changes[k] for k in columns] + [transaction_id]
+        )
+
+    def delete_transaction(self, transaction_id: int) -> None:
+        self._execute(f"DELETE FROM transactions WHERE {self.FIRST_ROW}", (transaction_id,))
+
+    # ---------- Queries pushed down to SQL ----------
+    def query_transactions(self, username: str, category: Optional[str] = None,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> List[Dict]:
+        """Filtered rows from the indexes; dated searches come back in date order"""
+        sql = f"SELECT {', '.join(TRANSACTION_FIELDS)} FROM transactions WHERE user = ?"
+        params: List = [username]
+        if category:
+            sql += " AND category = ? COLLATE NOCASE"
+            params.append(category)
+        if start_date:
+            sql += " AND date >= ?"
+            params.append(_bound(start_date))
+        if end_date:
+            sql += " AND date <= ?"
+            params.append(_bound(end_date, end_of_day=True))
+        order = " ORDER BY date, seq" if category or start_date or end_date else " ORDER BY seq"
+        cursor = self._execute(sql + order, params)
+        return [_normalize_transaction(dict(row)) for row in cursor]
+
+    def user_aggregates(self, username: str) -> UserAggregates:
+        """The user's UserAggregates from one GROUP BY query.
+
+        Amounts are rounded to cents per row like to_cents, except that SQLite
+        rounds exact half cents away from zero rather than to even.
+        """
+        cursor = self._execute(
+            "SELECT type, category, substr(date, 1, 7) AS month, COUNT(*) AS count, "
+            "SUM(CAST(ROUND(amount * 100) AS INTEGER)) AS cents "
+            "FROM transactions WHERE user = ? GROUP BY type, category, month",
+            (username,)
+        )
+        result = UserAggregates()
+        for row in cursor:
+            t_type, cents, count = row["type"], row["cents"], row["count"]
+            result.count += count
+            result.totals[t_type] = result.totals.get(t_type, 0) + cents
+            result.counts[t_type] = result.counts.get(t_type, 0) + count
+            if t_type == "expense":
+                bucket = result.categories.setdefault(row["category"], [0, 0])
+                bucket[0] += cents
+                bucket[1] += count
+            month = result.months.setdefault(row["month"], {"income": 0, "expense": 0, "count": 0})
+            if t_type in ("income", "expense"):
+                month[t_type] += cents
+            month["count"] += count
+        return result
+
+    # ---------- Users ----------
+    def load_users(self) -> Dict:
+        self.watch(USERS_FILE)
+        cursor = self._execute("SELECT username, data FROM users")
+        return {row["username"]: json.loads(row["data"]) for row in cursor}
+
+    def save_users(self, users: Dict) -> None:
+        if not isinstance(users, dict):
+            raise DataValidationError("Invalid users data type")
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.execute("DELETE FROM users")
+                self.conn.executemany(
+                    "INSERT INTO users (username, data) VALUES (?, ?)",
+                    ((name, json.dumps(record, ensure_ascii=False)) for name, record in users.items())
+                )
+        except sqlite3.Error as e:
+            raise FileAccessError(f"Error writing users to database: {str(e)}")
+
+    def save_user(self, users: Dict, username: str) -> None:
+        if username not in users:
+            self._execute("DELETE FROM users WHERE username = ?", (username,))
+            return
+        self._execute(
+            "INSERT INTO users (username, data) VALUES (?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET data = excluded.data",
+            (username, json.dumps(users[username], ensure_ascii=False))
+        )
+
+    # ---------- JSON documents ----------
+    def load_document(self, name: str) -> Dict:
+        self.watch(name)
+        row = self._execute("SELECT data FROM documents WHERE name = ?", (name,)).fetchone()
+        return json.loads(row["data"]) if row else {}
+
+    def save_document(self, name: str, data: Dict) -> None:
+        self._execute(
+            "INSERT INTO documents (name, data) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+            (name, json.dumps(data, ensure_ascii=False))
+        )
+
+
+def _bound(value: str, end_of_day: bool = False) -> str:
+    """Canonical form of a search date; a date-only upper bound covers the whole day"""
+    moment = parse_date(value)
+    if end_of_day and ":" not in value:
+        moment = moment.replace(hour=23, minute=59, second=59)
+    return moment.strftime(DATE_FORMAT)
+
+
+def get_storage() -> Storage:
+    """Shared backend selected by the PFM_STORAGE environment variable"""
+    global _default_storage
+    if _default_storage is None:
+        backend = os.environ.get(STORAGE_ENV, "file").lower()
+        if backend == "sqlite":
+            _default_storage = SQLiteStorage()
+        elif backend == "file":
+            _default_storage = FileStorage()
+        else:
+            raise DataValidationError(f"Unknown storage backend: {backend}")
+    return _default_storage
@@ -0,0 +1,62 @@
+"""Every test runs in its own empty data directory.
+
+The managers read and write files relative to the working directory, so
+this keeps the repository's own data files out of reach.
+"""
+import atexit
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import managers  # noqa: E402
+import storage  # noqa: E402
+from storage import FileStorage  # noqa: E402
+from transactions import TransactionManager  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    exit_hooks = []
+    monkeypatch.setattr(atexit, "register", lambda fn, *args: exit_hooks.append((fn, args)))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv(storage.STORAGE_ENV, raising=False)
+    monkeypatch.setattr(storage, "_default_storage", None)
+    for factory in (managers.get_transaction_manager, managers.get_user_manager,
+                    managers.get_reports_manager, managers.get_advanced_features):
+        factory.cache_clear()
+    yield tmp_path
+    # Settle journals and id blocks now, not at exit in another directory
+    for fn, args in reversed(exit_hooks):
+        fn(*args)
+
+
+@pytest.fixture
+def manager():
+    """A TransactionManager over the file backend in the test's directory"""
+    return TransactionManager(FileStorage())
+
+
+def reopen(manager: TransactionManager) -> TransactionManager:
+    """A fresh manager over the same files, as the next run would see them"""
+    manager.storage.sync()
+    return TransactionManager(FileStorage())
+
+
+def spawn(code: str, **kwargs) -> subprocess.Popen:
+    """Run Python code in another process in the test's directory"""
+    return subprocess.Popen([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=ROOT), **kwargs)
+
+
+def add_rows(manager: TransactionManager, user: str, rows):
+    """Bulk-add (date, type, amount, category) tuples for one user"""
+    added, errors = manager.bulk_add_transactions(
+        {"user": user, "date": date, "type": t_type, "amount": amount, "category": category}
+        for date, t_type, amount, category in rows
+    )
+    assert not errors
+    return added
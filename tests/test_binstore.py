@@ -0,0 +1,61 @@
+import pytest
+
+import manage
+from binstore import BinaryTransactions, csv_to_binary, write_binary
+from conftest import add_rows, reopen
+from storage import FileStorage
+from utils import BINARY_FILE, iter_transactions, load_transactions
+
+
+def live_rows(manager):
+    rows = add_rows(manager, "ann", [
+        ("2025-08-01", "income", 10.005, "Gift"),
+        ("2025-08-02 13:45:07", "expense", 0.1, "Food"),
+    ])
+    manager.edit_transaction(rows[1]["id"], {"description": 'lunch, "tacos"\nwith a newline'})
+    manager.compact()
+    return rows
+
+
+def test_binary_round_trip_is_exact(manager):
+    live_rows(manager)
+    with open("transactions.csv", "a", encoding="utf-8") as f:
+        f.write("99,ann,3.333,Misc,,expense,someday\n")
+    csv_to_binary()
+    with BinaryTransactions() as binary:
+        assert list(binary) == list(iter_transactions())
+    assert FileStorage()._binary_current()
+
+
+def test_compaction_from_the_binary_keeps_exact_amounts(manager):
+    rows = live_rows(manager)
+    csv_to_binary()
+    again = reopen(manager)
+    assert again.get_transaction_by_id(rows[0]["id"])["amount"] == 10.005
+    again.add_transaction("ann", 2, "Food", "", "expense")
+    again.compact()
+
+    assert FileStorage()._binary_current()   # rewritten for the new CSV
+    amounts = sorted(t["amount"] for t in load_transactions())
+    assert amounts == [0.1, 2.0, 10.005]
+    with BinaryTransactions() as binary:
+        assert list(binary) == list(iter_transactions())
+
+
+def test_binary_of_another_csv_is_never_loaded(manager):
+    rows = live_rows(manager)
+    with open("other.csv", "w", encoding="utf-8") as f:
+        f.write("id,user,amount,category,description,type,date\n1,bob,5,Food,,expense,2025-01-01\n")
+    with pytest.raises(SystemExit):
+        manage.main(["to-binary", "--csv", "other.csv"])
+
+    write_binary(iter_transactions("other.csv"), BINARY_FILE)   # no source recorded
+    assert not FileStorage()._binary_current()
+    csv_to_binary(BINARY_FILE, "other.csv")
+    assert not FileStorage()._binary_current()
+
+    again = reopen(manager)
+    again.add_transaction("ann", 1, "Food", "", "expense")
+    again.compact()
+    assert {t["user"] for t in load_transactions()} == {"ann"}
+    assert {rows[0]["id"], rows[1]["id"]} <= {t["id"] for t in load_transactions()}
@@ -0,0 +1,51 @@
+import json
+
+import cli
+import persistence
+
+
+def run(capsys, *argv):
+    status = cli.main(list(argv))
+    out, err = capsys.readouterr()
+    return status, out, err
+
+
+def test_report_json_has_plain_numbers(capsys):
+    cli.main(["add", "--user", "ann", "--amount", "1200.50", "--type", "income", "--category", "Salary"])
+    cli.main(["add", "--user", "ann", "--amount", "200", "--type", "expense", "--category", "Food"])
+    capsys.readouterr()
+
+    status, out, _ = run(capsys, "report", "dashboard", "--user", "ann", "--json")
+    assert status == 0
+    assert json.loads(out) == {"income": 1200.5, "expenses": 200, "net_balance": 1000.5, "count": 2}
+
+    status, out, err = run(capsys, "report", "monthly", "--user", "ann", "--json")
+    assert status == 1
+    assert "needs a month" in json.loads(out)["error"] and err == ""
+
+
+def test_batch_runs_every_line_with_one_flush_per_file(capsys, tmp_path):
+    jobs = tmp_path / "jobs.txt"
+    jobs.write_text(
+        "# monthly jobs\n"
+        "add --user ann --amount 10 --type expense --category Food\n"
+        "\n"
+        "add --user ann --amount 5 --type expense --category Bus\n"
+        "add --user ann --amount oops --type expense\n"
+        "set-budget --user ann --month 2025-1 --limit 300\n"
+        "search --user ann --category food\n",
+        encoding="utf-8",
+    )
+    writes = persistence.stats.copy()
+    status, out, err = run(capsys, "batch", str(jobs), "--json")
+
+    assert status == 1   # the bad line fails, the others still run
+    results = [json.loads(line) for line in out.splitlines()]
+    assert [r["amount"] for r in results[:2]] == [10, 5]
+    assert "line 5" in results[2]["error"]
+    assert results[3] == {"month": "2025-01", "limit": 300}
+    assert [r["category"] for r in results[4]] == ["Food"]
+    assert "batch:" in err
+
+    done = persistence.stats - writes
+    assert done.performed < done.requested   # coalesced into one flush per file
@@ -0,0 +1,61 @@
+import subprocess
+
+import manage
+from conftest import add_rows, reopen, spawn
+from storage import ID_BLOCK_SIZE, SQLiteStorage
+from transactions import TransactionManager
+from utils import load_sequence, load_transactions
+
+WORKER = """
+from storage import FileStorage
+from transactions import TransactionManager
+manager = TransactionManager(FileStorage())
+for n in range({count}):
+    manager.add_transaction("{user}", n + 1, "Food", "", "expense")
+"""
+
+
+def test_deleted_ids_are_not_handed_out_again(manager):
+    rows = add_rows(manager, "ann", [
+        ("2025-05-01", "income", 10, "Gift"),
+        ("2025-05-02", "expense", 3, "Food"),
+        ("2025-05-03", "expense", 4, "Food"),
+    ])
+    last = rows[-1]["id"]
+    manager.delete_transaction(last)
+    manager.delete_transaction(rows[-2]["id"])
+    assert manager.add_transaction("ann", 1, "Food", "", "expense")["id"] == last + 1
+
+    again = reopen(manager)
+    assert load_sequence() == last + 1   # the unused part of the block was handed back
+    assert again.add_transaction("ann", 2, "Food", "", "expense")["id"] == last + 2
+
+
+def test_processes_allocate_disjoint_ids(manager):
+    add_rows(manager, "ann", [("2025-05-01", "income", 10, "Gift")])
+    manager.storage.sync()
+    count = ID_BLOCK_SIZE + 20   # every worker has to come back for a second block
+    workers = [spawn(WORKER.format(count=count, user=f"user{n}"), stderr=subprocess.PIPE) for n in range(4)]
+    for worker in workers:
+        _, errors = worker.communicate(timeout=120)
+        assert worker.returncode == 0, errors.decode()
+
+    ids = [t["id"] for t in load_transactions()]
+    assert len(ids) == 1 + 4 * count
+    assert len(set(ids)) == len(ids)
+    assert load_sequence() >= max(ids)
+
+
+def test_migrate_keeps_deleted_ids_retired(manager):
+    rows = add_rows(manager, "ann", [("2025-05-01", "income", 10, "Gift"), ("2025-05-02", "expense", 3, "Food")])
+    manager.delete_transaction(rows[-1]["id"])
+    manager.storage.sync()
+
+    assert manage.main(["migrate", "--db", "finance.db"]) == 0
+    target = SQLiteStorage("finance.db")
+    try:
+        added = TransactionManager(target).add_transaction("ann", 1, "Food", "", "expense")
+        assert added["id"] == rows[-1]["id"] + 1
+    finally:
+        target.sync()
+        target.conn.close()
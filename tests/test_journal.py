@@ -0,0 +1,91 @@
+import json
+import os
+
+from conftest import add_rows, reopen
+from storage import FileStorage
+from transactions import TransactionManager
+from utils import JOURNAL_FILE, TransactionJournal, load_transactions
+
+
+def snapshot(manager):
+    return sorted((t["id"], t["user"], t["amount"], t["category"]) for t in manager.transactions)
+
+
+def test_replay_applies_adds_updates_and_deletes(manager):
+    first, second, third = add_rows(manager, "ann", [
+        ("2025-01-05", "income", 100, "Salary"),
+        ("2025-01-06", "expense", 20, "Food"),
+        ("2025-01-07", "expense", 30, "Rent"),
+    ])
+    manager.edit_transaction(second["id"], {"amount": 25.0})
+    manager.delete_transaction(third["id"])
+
+    assert len(TransactionJournal()) == 5
+    again = reopen(manager)
+    assert snapshot(again) == [(first["id"], "ann", 100.0, "Salary"), (second["id"], "ann", 25.0, "Food")]
+
+
+def test_journal_count_is_lazy():
+    with open(JOURNAL_FILE, "w", encoding="utf-8") as f:
+        f.write('{"op": "delete", "id": 1}\n\n{"op": "delete", "id": 2}\n')
+    journal = TransactionJournal()
+    assert journal._entries is None
+    assert len(journal) == 2
+    journal.append("delete", id=3)
+    assert len(journal) == 3
+
+
+def test_partial_last_line_is_skipped_and_not_glued_to_the_next_record(manager):
+    ann = add_rows(manager, "ann", [("2025-02-01", "income", 50, "Gift")])[0]
+    manager.storage.sync()
+    # A crash in the middle of an append leaves half a record and no newline
+    with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "row": {"id": 99, "user": "ann", "amo')
+
+    again = reopen(manager)
+    assert snapshot(again) == [(ann["id"], "ann", 50.0, "Gift")]
+
+    later = again.add_transaction("ann", 7, "Food", "", "expense")
+    records = list(TransactionJournal().read())
+    assert records[-1]["row"]["id"] == later["id"]
+    assert snapshot(reopen(again)) == [(ann["id"], "ann", 50.0, "Gift"), (later["id"], "ann", 7.0, "Food")]
+
+
+def test_compaction_folds_a_torn_journal_into_the_snapshot(manager):
+    rows = add_rows(manager, "bob", [("2025-03-01", "expense", 10, "Food"), ("2025-03-02", "expense", 12, "Bus")])
+    manager.delete_transaction(rows[0]["id"])
+    manager.storage.sync()
+    with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+        f.write('{"op": "upd')
+
+    again = reopen(manager)
+    again.compact()
+    assert not os.path.exists(JOURNAL_FILE)
+    assert [t["id"] for t in load_transactions()] == [rows[1]["id"]]
+    assert snapshot(reopen(again)) == [(rows[1]["id"], "bob", 12.0, "Bus")]
+
+
+def test_compaction_snapshot_is_not_replayed_twice(manager):
+    """An add already in the CSV (journal left behind by a crash) is applied once"""
+    row = add_rows(manager, "cy", [("2025-04-01", "income", 5, "Tips")])[0]
+    manager.storage.sync()
+    with open(JOURNAL_FILE, encoding="utf-8") as f:
+        leftover = f.read()
+    manager.compact()
+    with open(JOURNAL_FILE, "w", encoding="utf-8") as f:
+        f.write(leftover)
+
+    assert [t["id"] for t in reopen(manager).transactions] == [row["id"]]
+    assert json.loads(leftover.splitlines()[0])["op"] == "add"
+
+
+def test_moving_a_row_to_another_user_reaches_their_lazy_load(manager):
+    ann = add_rows(manager, "ann", [("2025-04-01", "expense", 8, "Food")])[0]
+    add_rows(manager, "bob", [("2025-04-02", "expense", 5, "Food")])
+    manager.compact()
+    manager.edit_transaction(ann["id"], {"user": "bob"})
+    manager.storage.sync()
+
+    lazy = TransactionManager(FileStorage(), lazy=True)
+    assert lazy.get_user_aggregates("bob").count == 2
+    assert lazy.get_user_transactions("ann") == []
@@ -0,0 +1,61 @@
+import subprocess
+import time
+
+import persistence
+from conftest import add_rows, spawn
+from reports import BUDGET_FILE, ReportsManager
+from utils import TRANSACTIONS_FILE
+
+ADD = """
+from storage import FileStorage
+from transactions import TransactionManager
+TransactionManager(FileStorage()).add_transaction("ann", 7, "Food", "from elsewhere", "expense")
+"""
+
+
+def test_lock_excludes_other_processes():
+    with persistence.locked():
+        waiter = spawn("import persistence\nwith persistence.locked():\n    print('locked')",
+                       stdout=subprocess.PIPE)
+        time.sleep(0.5)
+        assert waiter.poll() is None
+    out, _ = waiter.communicate(timeout=30)
+    assert out.decode().strip() == "locked"
+
+
+def test_lock_is_reentrant():
+    with persistence.locked():
+        with persistence.locked():
+            pass
+        assert persistence._lock_handle is not None
+    assert persistence._lock_handle is None
+
+
+def test_own_writes_do_not_trigger_a_reload(manager, monkeypatch):
+    add_rows(manager, "ann", [("2025-06-01", "income", 50, "Gift")])
+    loads = []
+    monkeypatch.setattr(manager, "_load", lambda: loads.append(1))
+    manager.add_transaction("ann", 5, "Food", "", "expense")
+    manager.get_user_transactions("ann")
+    assert loads == []
+
+
+def test_writes_from_another_process_are_picked_up(manager):
+    add_rows(manager, "ann", [("2025-06-01", "income", 50, "Gift")])
+    manager.storage.sync()
+    assert not manager.storage.changed(TRANSACTIONS_FILE)
+
+    assert spawn(ADD).wait(timeout=60) == 0
+    descriptions = [t["description"] for t in manager.get_user_transactions("ann")]
+    assert descriptions[-1] == "from elsewhere"
+    assert manager.get_user_aggregates("ann").total("expense") == 7
+    assert not manager.storage.changed(TRANSACTIONS_FILE)
+
+
+def test_documents_saved_elsewhere_are_reloaded(manager):
+    reports = ReportsManager(manager)
+    reports.set_monthly_budget("ann", "2025-06", 100)
+    budget = ("from storage import FileStorage\n"
+              f"FileStorage().save_document({BUDGET_FILE!r}, {{'ann': {{'2025-06': {{'limit': 250}}}}}})")
+    assert spawn(budget).wait(timeout=60) == 0
+    assert reports.budget_status("ann", "2025-06").limit_cents == 25000
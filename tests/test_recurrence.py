@@ -0,0 +1,111 @@
+import json
+from datetime import date
+from typing import Dict
+
+import pytest
+
+from advancedFeatures import RECURRING_FILE, AdvancedFeatures
+from recurrence import RecurringScheduler, add_months, due_occurrences
+
+
+@pytest.mark.parametrize("year, february", [(2025, 28), (2024, 29)])
+def test_month_end_schedule_returns_to_the_31st(year, february):
+    entry = {"frequency": "monthly", "next_date": f"{year}-01-31", "day": 31}
+    due, following = due_occurrences(entry, date(year, 3, 31))
+    assert due == [date(year, 1, 31), date(year, 2, february), date(year, 3, 31)]
+    assert following == date(year, 4, 30)
+
+
+def test_add_months_clamps_to_the_month_end_across_years():
+    assert add_months(date(2025, 12, 31), 2, 31) == date(2026, 2, 28)
+    assert add_months(date(2024, 2, 29), 1, 30) == date(2024, 3, 30)
+
+
+def test_anchor_defaults_to_the_next_date_day():
+    """Schedules saved before "day" was stored keep their own day of month"""
+    due, following = due_occurrences({"frequency": "monthly", "next_date": "2025-01-15"}, date(2025, 2, 20))
+    assert due == [date(2025, 1, 15), date(2025, 2, 15)]
+    assert following == date(2025, 3, 15)
+
+
+def test_unknown_frequency_is_never_due():
+    assert due_occurrences({"frequency": "yearly", "next_date": "2025-01-01"}, date(2026, 1, 1)) == (
+        [], date(2025, 1, 1)
+    )
+
+
+def test_processing_catches_up_missed_month_ends(manager):
+    with open(RECURRING_FILE, "w", encoding="utf-8") as f:
+        json.dump({"ann": [{
+            "amount": 900.0, "category": "Rent", "description": "", "type": "expense",
+            "frequency": "monthly", "next_date": "2024-01-31", "day": 31,
+        }]}, f)
+    features = AdvancedFeatures(manager)
+
+    assert features.process_recurring_transactions("ann", date(2024, 3, 31)) == 3
+    assert features.process_all_recurring_transactions(date(2024, 5, 31)) == {"ann": 2}
+    assert features.process_recurring_transactions("ann", date(2024, 5, 31)) == 0
+
+    dates = [t["date"][:10] for t in manager.get_user_transactions("ann")]
+    assert dates == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30", "2024-05-31"]
+    assert features.get_recurring_transactions("ann")[0]["next_date"] == "2024-06-30"
+
+
+def schedule(next_date: str, amount: float = 10.0) -> Dict:
+    return {"amount": amount, "category": "Bills", "description": "", "type": "expense",
+            "frequency": "monthly", "next_date": next_date, "day": int(next_date[-2:])}
+
+
+def test_schedules_get_stable_ids_and_the_heap_is_rebuilt_from_them(manager):
+    with open(RECURRING_FILE, "w", encoding="utf-8") as f:
+        json.dump({"ann": [schedule("2025-01-10")], "bob": [schedule("2025-03-05")],
+                   "cy": [schedule("2025-01-20"), schedule("2025-02-01")]}, f)
+    features = AdvancedFeatures(manager)
+    assert features.process_all_recurring_transactions(date(2025, 1, 31)) == {"ann": 1, "cy": 1}
+
+    with open(RECURRING_FILE, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert [entry["id"] for entry in saved["cy"]] == [1, 2]
+    heap = RecurringScheduler(saved)
+    assert len(heap) == 4
+    assert list(heap.pop_due(date(2025, 1, 31))) == []
+    assert [(user, entry["id"]) for user, entry in heap.pop_due(date(2025, 2, 20))] == [
+        ("cy", 2), ("ann", 1), ("cy", 1)
+    ]
+
+
+def test_reordered_or_removed_schedules_are_not_confused(manager):
+    with open(RECURRING_FILE, "w", encoding="utf-8") as f:
+        json.dump({"ann": [schedule("2025-01-10", 1), schedule("2025-01-20", 2)]}, f)
+    features = AdvancedFeatures(manager)
+    features.process_all_recurring_transactions(date(2025, 1, 1))   # builds the heap
+
+    ann = features.get_recurring_transactions("ann")
+    assert [entry["id"] for entry in ann] == [1, 2]
+    with open(RECURRING_FILE, "w", encoding="utf-8") as f:   # reorder, drop one, add one
+        json.dump({"ann": [ann[1], schedule("2025-01-05", 3)]}, f)
+
+    assert features.process_all_recurring_transactions(date(2025, 1, 25)) == {"ann": 2}
+    assert sorted(t["amount"] for t in manager.get_user_transactions("ann")) == [2, 3]
+    assert [entry["id"] for entry in features.get_recurring_transactions("ann")] == [2, 3]
+
+
+def test_heap_items_left_stale_by_a_single_user_run_are_corrected(manager):
+    with open(RECURRING_FILE, "w", encoding="utf-8") as f:
+        json.dump({"ann": [schedule("2025-01-10")], "bob": [schedule("2025-01-15")]}, f)
+    features = AdvancedFeatures(manager)
+    assert features.process_all_recurring_transactions(date(2025, 1, 1)) == {}   # builds the heap
+
+    assert features.process_recurring_transactions("ann", date(2025, 2, 15)) == 2
+    assert features.process_all_recurring_transactions(date(2025, 3, 12)) == {"ann": 1, "bob": 2}
+    dates = [t["date"][:10] for t in manager.get_user_transactions("ann")]
+    assert dates == ["2025-01-10", "2025-02-10", "2025-03-10"]
+
+
+def test_added_schedules_join_the_heap(manager):
+    features = AdvancedFeatures(manager)
+    features.process_all_recurring_transactions(date(2025, 1, 1))
+    first = features.add_recurring_transaction("ann", 5, "Gym", "", "expense", "weekly")
+    second = features.add_recurring_transaction("ann", 7, "Pool", "", "expense", "weekly")
+    assert (first["id"], second["id"]) == (1, 2)
+    assert features.process_all_recurring_transactions() == {"ann": 2}
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import add_rows
+from reports import ReportsManager
+from utils import DataValidationError
+
+
+def test_trend_report_accepts_unpadded_months(manager):
+    add_rows(manager, "ann", [
+        ("2025-01-15", "income", 100, "Salary"),
+        ("2025-03-02", "expense", 40, "Food"),
+        ("2025-09-30", "expense", 25, "Food"),
+        ("2025-10-01", "income", 300, "Salary"),
+    ])
+    reports = ReportsManager(manager)
+
+    report = reports.trend_report("ann", "2025-9", "2025-10")
+    assert (report.start_month, report.end_month) == ("2025-09", "2025-10")
+    assert [row.period for row in report.rows] == ["2025-09", "2025-10"]
+    assert [row.totals.count for row in report.rows] == [1, 1]
+
+    report = reports.trend_report("ann", "2025-1", "2025-3")
+    assert [row.period for row in report.rows] == ["2025-01", "2025-02", "2025-03"]
+    assert report.total.income_cents == 10000
+    assert report.total.expense_cents == 4000
+
+
+def test_report_dispatch_and_budget_return_data(manager, capsys):
+    add_rows(manager, "ann", [("2025-09-03", "expense", 150, "Food")])
+    reports = ReportsManager(manager)
+
+    assert reports.set_monthly_budget("ann", "2025-9", 200) == {"month": "2025-09", "limit": 200}
+    assert capsys.readouterr().out == ""
+    assert reports.report("ann", "budget", "2025-09")["status"] == "ok"
+    assert reports.report("ann", "monthly", "2025-9")["expenses"] == 150
+    for name, month in (("weekly", None), ("monthly", None), ("budget", "")):
+        with pytest.raises(DataValidationError):
+            reports.report("ann", name, month)
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+
+from server import FinanceServer, WriteBatcher
+from utils import BCRYPT_ROUNDS_ENV
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv(BCRYPT_ROUNDS_ENV, "4")
+    return FinanceServer(WriteBatcher(delay=0.001))
+
+
+def call(app, method, target, body=None, token=None):
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    payload = json.dumps(body).encode() if body is not None else b""
+    return app.dispatch(method, target, headers, payload)
+
+
+async def login(app, username="ann"):
+    await call(app, "POST", "/register", {"username": username, "password": "Secret123!"})
+    status, body = await call(app, "POST", "/login", {"username": username, "password": "Secret123!"})
+    assert status == 200
+    return body["token"]
+
+
+def test_requests_need_a_valid_token(app):
+    async def scenario():
+        assert (await call(app, "GET", "/profile"))[0] == 401
+        token = await login(app)
+        status, profile = await call(app, "GET", "/profile", token=token)
+        assert (status, profile) == (200, {"username": "ann", "balance": 0.0})
+        await call(app, "POST", "/logout", token=token)
+        assert (await call(app, "GET", "/profile", token=token))[0] == 401
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_writes_share_a_batch_and_reports_see_them(app):
+    async def scenario():
+        token = await login(app)
+        writes = [call(app, "POST", "/transactions", {"amount": n, "type": "expense", "category": "Food"}, token)
+                  for n in range(1, 6)]
+        results = await asyncio.gather(*writes)
+        assert [status for status, _ in results] == [201] * 5
+        assert len({row["id"] for _, row in results}) == 5
+
+        status, bad = await call(app, "POST", "/transactions", {"amount": "x", "type": "expense"}, token)
+        assert status == 400 and "Invalid amount" in bad["error"]
+
+        status, report = await call(app, "GET", "/reports/dashboard", token=token)
+        assert (status, report["expenses"], report["count"]) == (200, 15, 5)
+        status, rows = await call(app, "GET", "/transactions?category=food&from=2000-01-01", token=token)
+        assert (status, len(rows)) == (200, 5)
+
+    asyncio.run(scenario())
+    assert (app.batcher.writes, app.batcher.batches) == (5, 1)   # the bad row never reached the batcher
@@ -0,0 +1,54 @@
+import pytest
+
+from conftest import add_rows
+from storage import SQLiteStorage
+from transactions import TransactionManager
+
+ROWS = [
+    ("2025-01-05 08:00:00", "income", 1000, "Salary"),
+    ("2025-01-09", "expense", 12.34, "Food"),
+    ("2025-01-31 23:59:59", "expense", 40, "food"),
+    ("2025-02-01", "expense", 7.5, "Bus"),
+    ("2025-02-14 12:00:00", "expense", 0.1, "Food"),
+    ("2025-03-01", "income", 20, "Gift"),
+]
+SEARCHES = [
+    {},
+    {"category": "FOOD"},
+    {"start_date": "2025-01-09", "end_date": "2025-01-31"},
+    {"category": "food", "start_date": "2025-01-10"},
+    {"end_date": "2025-02-01"},
+]
+
+
+@pytest.fixture
+def database():
+    storage = SQLiteStorage("finance.db")
+    manager = TransactionManager(storage)
+    add_rows(manager, "ann", ROWS)
+    add_rows(manager, "bob", [("2025-01-09", "expense", 5, "Food")])
+    yield storage
+    storage.sync()
+    storage.conn.close()
+
+
+def state(aggregates):
+    return (aggregates.count, aggregates.totals, aggregates.counts, aggregates.categories, aggregates.months)
+
+
+@pytest.mark.parametrize("filters", SEARCHES)
+def test_pushed_down_search_matches_the_in_memory_one(database, filters):
+    lazy = TransactionManager(database, lazy=True)
+    pushed = lazy.search_transactions("ann", **filters)
+    assert "ann" not in lazy._loaded_users   # answered by SQLite
+    assert pushed == TransactionManager(database).search_transactions("ann", **filters)
+
+
+def test_pushed_down_aggregates_match_the_running_totals(database):
+    lazy = TransactionManager(database, lazy=True)
+    pushed = lazy.get_user_aggregates("ann")
+    assert "ann" not in lazy._loaded_users
+    assert state(pushed) == state(TransactionManager(database).get_user_aggregates("ann"))
+
+    lazy.add_transaction("ann", 3, "Food", "", "expense")   # loads ann; totals are kept from then on
+    assert lazy.get_user_aggregates("ann").total("expense") == pytest.approx(62.94)
@@ -0,0 +1,53 @@
+from conftest import add_rows, reopen
+
+
+def test_delete_keeps_the_remaining_rows_in_order(manager):
+    rows = add_rows(manager, "ann", [
+        ("2025-07-01", "income", 100, "Salary"),
+        ("2025-07-02", "expense", 10, "Food"),
+        ("2025-07-03", "expense", 20, "Rent"),
+    ])
+    bob = add_rows(manager, "bob", [("2025-07-02", "expense", 5, "Food")])[0]
+    manager.delete_transaction(rows[1]["id"])
+
+    expected = [rows[0]["id"], rows[2]["id"], bob["id"]]
+    assert [t["id"] for t in manager.transactions] == expected
+    assert [t["id"] for t in manager.get_user_transactions("ann")] == expected[:2]
+    assert manager.get_transaction_by_id(rows[1]["id"]) is None
+    assert manager.search_transactions("ann", "food") == []
+    assert manager.get_user_aggregates("ann").total("expense") == 20
+
+    manager.compact()
+    assert [t["id"] for t in reopen(manager).transactions] == expected
+
+
+def test_deleting_a_users_last_row_drops_their_index(manager):
+    row = add_rows(manager, "cy", [("2025-07-04", "income", 1, "Tips")])[0]
+    assert manager.delete_transaction(row["id"])
+    assert not manager.delete_transaction(row["id"])
+    assert manager.get_user_transactions("cy") == []
+    assert "cy" not in manager._by_user
+
+
+def test_bulk_add_skips_invalid_rows_and_reports_them(manager):
+    seen = []
+    added, errors = manager.bulk_add_transactions([
+        {"user": "ann", "amount": "12.50", "type": "Expense", "category": " Food ", "date": "2025-07-01"},
+        {"user": "", "amount": 1, "type": "income"},
+        {"user": "ann", "amount": "ten", "type": "income"},
+        {"user": "ann", "amount": 5, "type": "transfer"},
+        {"user": "ann", "amount": 3, "type": "income", "date": "2025-02-30"},
+        {"user": "ann", "amount": 40, "type": "income", "date": "2025-07-02"},
+    ], batch_size=4, progress=seen.append)
+
+    assert [(t["amount"], t["type"], t["category"]) for t in added] == [(12.5, "expense", "Food"), (40, "income", "")]
+    assert [error.split(":")[0] for error in errors] == ["row 2", "row 3", "row 4", "row 5"]
+    assert "transfer" in errors[2]
+    assert seen == [4, 6]
+    assert [t["id"] for t in reopen(manager).get_user_transactions("ann")] == [t["id"] for t in added]
+
+
+def test_bulk_add_with_only_invalid_rows_writes_nothing(manager):
+    added, errors = manager.bulk_add_transactions([{"user": "ann", "amount": -1, "type": "income"}])
+    assert added == [] and len(errors) == 1
+    assert reopen(manager).transactions == []
@@ -0,0 +1,16 @@
+import json
+
+from conftest import add_rows
+from storage import get_storage
+from transactions import TransactionManager
+from users import UserManager
+
+
+def test_balance_is_derived_without_a_transaction_manager():
+    with open("users.json", "w", encoding="utf-8") as f:
+        json.dump({"ann": {"password": "x", "balance": 999.0}}, f)
+    add_rows(TransactionManager(get_storage()), "ann", [
+        ("2025-06-01", "income", 50, "Gift"),
+        ("2025-06-02", "expense", 20, "Food"),
+    ])
+    assert UserManager().get_user_balance("ann") == 30
@@ -1,72 +1,340 @@
-from typing import Dict, List, Optional
+import atexit
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
-from utils import load_transactions, save_transactions
+from utils import date_key, validate_transaction, DataValidationError, TRANSACTIONS_FILE
+from persistence import locked
+from instrumentation import timed, add_rows
+from storage import Storage, get_storage
+from aggregates import AggregateStore, UserAggregates
+
+# (date key, insertion sequence, row); the sequence breaks ties so rows are never compared
+DateEntry = Tuple[int, int, Dict]
 
 class TransactionManager:
-    def __init__(self):
-        self.transactions = load_transactions()
+    def __init__(self, storage: Optional[Storage] = None, lazy: bool = False):
+        """With lazy=True nothing is parsed up front: each user's rows are
+        loaded on first access, and self.transactions holds only loaded users
+        until compact() (or _ensure_all) pulls in the rest.
+        """
+        self.storage = storage or get_storage()
+        self._lazy_mode = lazy
+        self._load()
+        atexit.register(self.storage.sync)
+
+    def _load(self) -> None:
+        self.lazy = self._lazy_mode
+        self._loaded_users = set()
+        # Aggregates the backend summed for users not loaded into memory
+        self._queried: Dict[str, UserAggregates] = {}
+        # Rows keyed by id(row): insertion-ordered like a list, but a row is removed in O(1)
+        self._rows: Dict[int, Dict] = {}
+        self._keep([] if self.lazy else self.storage.load_transactions())
+        self._rebuild_indexes()
+
+    @property
+    def transactions(self) -> List[Dict]:
+        """The loaded rows in insertion order, as a new list"""
+        return list(self._rows.values())
+
+    def _keep(self, rows: Iterable[Dict]) -> None:
+        self._rows.update((id(row), row) for row in rows)
+
+    def _refresh(self) -> None:
+        """Reload if another process changed the stored transactions.
+
+        Runs before every operation; it costs a stat (or a PRAGMA) when
+        nothing changed. Writers call it while holding the lock.
+        """
+        if self.storage.changed(TRANSACTIONS_FILE):
+            self._load()
+
+    # -----------------------------
+    # Lazy loading
+    # -----------------------------
+    @timed()
+    def _ensure_user(self, username: str) -> None:
+        """Materialize a user's rows the first time they are needed"""
+        if self.lazy and username not in self._loaded_users:
+            self._loaded_users.add(username)
+            self._queried.pop(username, None)
+            rows = self.storage.load_user_transactions(username)
+            add_rows("transactions._ensure_user", len(rows))
+            self._keep(rows)
+            self._index_rows(rows)
+
+    def _ensure_owner(self, transaction_id: int) -> None:
+        if self.lazy and transaction_id not in self._by_id:
+            owner = self.storage.transaction_owner(transaction_id)
+            if owner is not None:
+                self._ensure_user(owner)
+
+    def _ensure_all(self) -> None:
+        """Load every user not materialized yet and leave lazy mode"""
+        if self.lazy:
+            rows = [t for t in self.storage.load_transactions()
+                    if t["user"] not in self._loaded_users]
+            self._keep(rows)
+            self._index_rows(rows)
+            self.lazy = False
+
+
+    # -----------------------------
+    # Indexes
+    # -----------------------------
+    def _rebuild_indexes(self) -> None:
+        """Build the id, per-user, date and category lookups from the loaded rows"""
+        self._by_id: Dict[int, Dict] = {}
+        self._by_user: Dict[str, Dict[int, Dict]] = {}   # rows keyed by id(row), as in _rows
+        self._by_date: Dict[str, List[DateEntry]] = {}
+        self._by_category: Dict[Tuple[str, str], List[DateEntry]] = {}
+        self._sequence = count()
+        self.aggregates = AggregateStore()
+        self._index_rows(self._rows.values())
+
+    def _index_rows(self, rows: Iterable[Dict]) -> None:
+        """Index a batch of rows, sorting each touched date list once at the end"""
+        touched = set()
+        for transaction in rows:
+            self._index(transaction, keep_sorted=False)
+            self.aggregates.apply(transaction)
+            touched.add(transaction["user"])
+            touched.add((transaction["user"], transaction["category"].lower()))
+        for key in touched:
+            index = self._by_category if isinstance(key, tuple) else self._by_date
+            index[key].sort()
+
+    @staticmethod
+    def _date_key(transaction: Dict) -> int:
+        # Unparseable dates sort first and never match a date range
+        try:
+            return date_key(transaction["date"])
+        except DataValidationError:
+            return 0
+
+    def _index(self, transaction: Dict, keep_sorted: bool = True) -> None:
+        # Keep the first row for a duplicated id, like the old linear scan did
+        self._by_id.setdefault(int(transaction["id"]), transaction)
+        self._by_user.setdefault(transaction["user"], {})[id(transaction)] = transaction
+
+        entry = (self._date_key(transaction), next(self._sequence), transaction)
+        category_key = (transaction["user"], transaction["category"].lower())
+        for entries in (self._by_date.setdefault(transaction["user"], []),
+                        self._by_category.setdefault(category_key, [])):
+            if keep_sorted:
+                insort(entries, entry)
+            else:
+                entries.append(entry)
 
+    def _unindex(self, transaction: Dict) -> None:
+        transaction_id = int(transaction["id"])
+        if self._by_id.get(transaction_id) is transaction:
+            del self._by_id[transaction_id]
+        user_rows = self._by_user.get(transaction["user"], {})
+        user_rows.pop(id(transaction), None)
+        if not user_rows:
+            self._by_user.pop(transaction["user"], None)
+
+        key = self._date_key(transaction)
+        category_key = (transaction["user"], transaction["category"].lower())
+        for index, index_key in ((self._by_date, transaction["user"]),
+                                 (self._by_category, category_key)):
+            entries = index.get(index_key, [])
+            i = bisect_left(entries, (key,))
+            while i < len(entries) and entries[i][0] == key:
+                if entries[i][2] is transaction:
+                    del entries[i]
+                    break
+                i += 1
+            if not entries:
+                index.pop(index_key, None)
+
+    def _after_write(self) -> None:
+        """Fold journaled changes into a fresh snapshot once the backend asks for it"""
+        if self.storage.needs_compaction():
+            self.compact()
+
+    @timed()
+    def compact(self) -> None:
+        """Rewrite the stored snapshot from memory"""
+        with locked():
+            self._refresh()
+            self._ensure_all()
+            self.storage.save_transactions(self.transactions)
+
+    @timed()
     def add_transaction(self, user: str, amount: float, category: str, description: str, 
                        transaction_type: str) -> Dict:
         """Add a new transaction"""
-        transaction = {
-            "id": len(self.transactions) + 1,
-            "user": user,
-            "amount": amount,
-            "category": category,
-            "description": description,
-            "type": transaction_type,
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        self.transactions.append(transaction)
-        save_transactions(self.transactions)
+        with locked():
+            self._refresh()
+            self._ensure_user(user)
+            transaction = {
+                "id": self.storage.allocate_ids(1),
+                "user": user,
+                "amount": amount,
+                "category": category,
+                "description": description,
+                "type": transaction_type,
+                "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+
+            self._keep((transaction,))
+            self._index(transaction)
+            self.aggregates.apply(transaction)
+            self.storage.insert_transaction(transaction)
+            self._after_write()
         return transaction
 
+    @timed()
+    def bulk_add_transactions(self, rows: Iterable[Dict], batch_size: int = 5000,
+                              progress: Optional[Callable[[int], None]] = None
+                              ) -> Tuple[List[Dict], List[str]]:
+        """Validate and add many transactions with a single write.
+
+        Rows are dicts with user, amount, type and optional category,
+        description and date. Invalid rows are skipped and reported as
+        "row N: reason" strings. progress(rows_seen) is called once per batch.
+        Returns (added transactions, errors).
+        """
+        added: List[Dict] = []
+        errors: List[str] = []
+        seen = 0
+        for number, row in enumerate(rows, start=1):
+            try:
+                added.append(validate_transaction(row))
+            except DataValidationError as e:
+                errors.append(f"row {number}: {e}")
+            seen = number
+            if progress and seen % batch_size == 0:
+                progress(seen)
+        if progress and seen % batch_size:
+            progress(seen)
+        if not added:
+            return added, errors
+
+        with locked():
+            self._refresh()
+            for user in {t["user"] for t in added}:
+                self._ensure_user(user)
+            first_id = self.storage.allocate_ids(len(added))
+            for offset, transaction in enumerate(added):
+                transaction["id"] = first_id + offset
+            self._keep(added)
+            self._index_rows(added)
+
+            if self.storage.needs_compaction(len(added)):
+                self.compact()
+            else:
+                self.storage.insert_transactions(added)
+        return added, errors
+
+    @timed()
     def get_user_transactions(self, username: str) -> List[Dict]:
         """Get all transactions for a specific user"""
-        return [t for t in self.transactions if t["user"] == username]
+        self._refresh()
+        self._ensure_user(username)
+        return list(self._by_user.get(username, {}).values())
+
+    def _pushdown(self, username: str) -> bool:
+        """True when a read for this user can go to the backend instead of
+        loading their rows (lazy mode, user not in memory yet)"""
+        return self.lazy and username not in self._loaded_users
+
+    @timed()
+    def get_user_aggregates(self, username: str) -> UserAggregates:
+        """Running totals for a user, maintained on add, edit and delete.
+
+        For a user not loaded yet, a backend that can sum in place (SQLite)
+        answers instead, and the result is kept until their rows are loaded.
+        """
+        self._refresh()
+        if self._pushdown(username):
+            totals = self._queried.get(username) or self.storage.user_aggregates(username)
+            if totals is not None:
+                self._queried[username] = totals
+                return totals
+        self._ensure_user(username)
+        return self.aggregates.get(username)
 
+    @timed()
     def get_transaction_by_id(self, transaction_id: int) -> Optional[Dict]:
         """Get a specific transaction by ID"""
-        for transaction in self.transactions:
-            if int(transaction["id"]) == transaction_id:
-                return transaction
-        return None
+        self._refresh()
+        self._ensure_owner(transaction_id)
+        return self._by_id.get(transaction_id)
 
+    @timed()
     def delete_transaction(self, transaction_id: int) -> bool:
         """Delete a transaction by ID"""
-        for i, transaction in enumerate(self.transactions):
-            if int(transaction["id"]) == transaction_id:
-                self.transactions.pop(i)
-                save_transactions(self.transactions)
-                return True
-        return False
+        with locked():
+            self._refresh()
+            self._ensure_owner(transaction_id)
+            transaction = self._by_id.get(transaction_id)
+            if transaction is None:
+                return False
+            self._unindex(transaction)
+            self.aggregates.apply(transaction, -1)
+            del self._rows[id(transaction)]
+            self.storage.delete_transaction(transaction_id)
+            self._after_write()
+        return True
 
+    @timed()
     def edit_transaction(self, transaction_id: int, 
                         updates: Dict[str, str]) -> Optional[Dict]:
         """Edit an existing transaction"""
-        for transaction in self.transactions:
-            if int(transaction["id"]) == transaction_id:
-                transaction.update(updates)
-                save_transactions(self.transactions)
-                return transaction
-        return None
+        with locked():
+            self._refresh()
+            self._ensure_owner(transaction_id)
+            transaction = self._by_id.get(transaction_id)
+            if transaction is None:
+                return None
+            if "user" in updates:
+                self._ensure_user(updates["user"])
+            reindex = any(field in updates for field in ("id", "user", "category", "date"))
+            if reindex:
+                self._unindex(transaction)
+            self.aggregates.apply(transaction, -1)
+            transaction.update(updates)
+            self.aggregates.apply(transaction)
+            if reindex:
+                self._index(transaction)
+            self.storage.update_transaction(transaction_id, updates)
+            self._after_write()
+        return transaction
 
+    @timed()
     def search_transactions(self, username: str, 
                           category: Optional[str] = None, 
                           start_date: Optional[str] = None,
                           end_date: Optional[str] = None) -> List[Dict]:
-        """Search transactions with filters"""
-        results = self.get_user_transactions(username)
-        
+        """Search transactions with filters; dated results come back in date order.
+
+        Dates may be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS; a date-only end_date
+        includes the whole day. Raises DataValidationError for bad dates.
+        A user not loaded yet is searched by the backend when it can filter
+        in place (SQLite).
+        """
+        self._refresh()
+        if self._pushdown(username):
+            rows = self.storage.query_transactions(username, category, start_date, end_date)
+            if rows is not None:
+                add_rows("transactions.search_transactions", len(rows))
+                return rows
+        self._ensure_user(username)
         if category:
-            results = [t for t in results if t["category"].lower() == category.lower()]
-            
-        if start_date:
-            results = [t for t in results if t["date"] >= start_date]
-            
+            entries = self._by_category.get((username, category.lower()), [])
+        elif start_date or end_date:
+            entries = self._by_date.get(username, [])
+        else:
+            return self.get_user_transactions(username)
+
+        lo, hi = 0, len(entries)
+        if start_date or end_date:
+            lo = bisect_left(entries, (date_key(start_date) if start_date else 1,))
         if end_date:
-            results = [t for t in results if t["date"] <= end_date]
-            
-        return results
+            hi = bisect_right(entries, (date_key(end_date, end_of_day=True), float("inf")))
+        add_rows("transactions.search_transactions", max(hi - lo, 0))
+        return [entry[2] for entry in entries[lo:hi]]
@@ -1,66 +1,194 @@
 
 import re
-from typing import Dict, Optional, Tuple
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
 from utils import (
-    load_users, save_users, hash_password, verify_password,
-    DataError, FileAccessError, DataValidationError
+    DataError, FileAccessError, DataValidationError, USERS_FILE
+)
+from storage import Storage, get_storage
+from persistence import locked
+from transactions import TransactionManager
+from auth import PasswordHasher, SessionStore, get_hasher
+from instrumentation import timed
+
+INVALID_LOGIN = "Invalid username or password"
+PASSWORD_PATTERN = re.compile(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@_#$%^&+=!]).{8,}$')
+PASSWORD_RULES = (
+    "Password must be at least 8 characters long, "
+    "contain at least one uppercase letter, one lowercase letter, "
+    "one number, and one special character (@, _, #, $, etc.)"
 )
 
 class UserManager:
-    def __init__(self):
-        self.users = load_users()
+    def __init__(self, storage: Optional[Storage] = None,
+                 transaction_manager: Optional[TransactionManager] = None,
+                 hasher: Optional[PasswordHasher] = None,
+                 sessions: Optional[SessionStore] = None):
+        """Balances come from transaction_manager's running aggregates; without
+        one, the shared lazy manager (or one over `storage`) is used on first need.
+        bcrypt runs on hasher's thread pool, and sessions lets a recently
+        authenticated user log back in without repeating it."""
+        self.storage = storage or get_storage()
+        self.transaction_manager = transaction_manager
+        self.hasher = hasher or get_hasher()
+        self.sessions = sessions or SessionStore()
+        self.users = self.storage.load_users()
         self.current_user = None
 
-    def register_user(self, username: str, password: str) -> Tuple[bool, str]:
-        try:
-            if not username or not password:
-                return False, "Username and password are required"
+    def _reload_users(self) -> None:
+        """Re-read users only if another process saved them since"""
+        if self.storage.changed(USERS_FILE):
+            self.users = self.storage.load_users()
+
+    def _register_precheck(self, username: str, password: str) -> Optional[Tuple[bool, str]]:
+        """Reject a missing field, a taken name or a weak password before
+        paying for a bcrypt hash; None if the account can be created"""
+        if not username or not password:
+            return False, "Username and password are required"
 
+        self._reload_users()
+        if username in self.users:
+            return False, "Username already exists"
+
+        #  Password regex validation
+        if not PASSWORD_PATTERN.match(password):
+            return False, PASSWORD_RULES
+        return None
+
+    def _register_result(self, username: str, hashed_password: bytes) -> Tuple[bool, str]:
+        with locked():
+            self._reload_users()
             if username in self.users:
                 return False, "Username already exists"
-
-            #  Password regex validation
-            pattern = r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@_#$%^&+=!]).{8,}$'
-            if not re.match(pattern, password):
-                return False, (
-                    "Password must be at least 8 characters long, "
-                    "contain at least one uppercase letter, one lowercase letter, "
-                    "one number, and one special character (@, _, #, $, etc.)"
-                )
-
-            hashed_password = hash_password(password)
-            
             self.users[username] = {
                 "password": hashed_password.decode('utf-8'),
-                "balance": 0.0
             }
-            save_users(self.users)
-            
-            self.users = load_users()
-            return True, "User registered successfully"
+            self.storage.save_user(self.users, username)
+        return True, "User registered successfully"
+
+    @timed()
+    def register_user(self, username: str, password: str) -> Tuple[bool, str]:
+        try:
+            failure = self._register_precheck(username, password)
+            if failure:
+                return failure
+            hashed_password = self.hasher.hash(password).result()
+            return self._register_result(username, hashed_password)
 
         except DataError as e:
             return False, f"Registration failed: {str(e)}"
         except Exception as e:
             return False, f"Unexpected error during registration: {str(e)}"
 
+    async def register_user_async(self, username: str, password: str) -> Tuple[bool, str]:
+        """register_user() for asyncio callers; the event loop keeps running during bcrypt"""
+        try:
+            failure = self._register_precheck(username, password)
+            if failure:
+                return failure
+            hashed_password = await self.hasher.hash_async(password)
+            return self._register_result(username, hashed_password)
+
+        except DataError as e:
+            return False, f"Registration failed: {str(e)}"
+        except Exception as e:
+            return False, f"Unexpected error during registration: {str(e)}"
+
+
+    @timed()
+    def register_users(self, accounts: Iterable[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        """Register many (username, password) pairs with a single write.
+
+        Passwords are hashed in parallel on the hashing pool. Invalid or
+        duplicate accounts are skipped and reported as "username: reason"
+        strings. Returns (registered usernames, errors).
+        """
+        errors: List[str] = []
+        pending: Dict[str, Future] = {}
+        self._reload_users()
+        for username, password in accounts:
+            if not username or not password:
+                errors.append(f"{username or '(blank)'}: Username and password are required")
+            elif username in self.users or username in pending:
+                errors.append(f"{username}: Username already exists")
+            elif not PASSWORD_PATTERN.match(password):
+                errors.append(f"{username}: {PASSWORD_RULES}")
+            else:
+                pending[username] = self.hasher.hash(password)
 
+        hashes = {username: future.result() for username, future in pending.items()}
+        registered: List[str] = []
+        with locked():
+            self._reload_users()
+            for username, hashed_password in hashes.items():
+                if username in self.users:
+                    errors.append(f"{username}: Username already exists")
+                    continue
+                self.users[username] = {"password": hashed_password.decode('utf-8')}
+                registered.append(username)
+            if registered:
+                self.storage.save_users(self.users)
+        return registered, errors
+
+    def _login_precheck(self, username: str, password: str) -> Optional[Tuple[bool, str]]:
+        """Reject a missing field or an unknown user without verifying a hash;
+        None if the password has to be checked"""
+        if not username or not password:
+            return False, "Username and password are required"
+        self._reload_users()
+        if username not in self.users:
+            return False, INVALID_LOGIN
+        return None
+
+    def _login_result(self, username: str, password: str, verified: bool) -> Tuple[bool, str]:
+        if not verified:
+            return False, INVALID_LOGIN
+        self.sessions.issue(username, password, self.users[username]["password"])
+        return True, "Login successful"
+
+    @timed()
     def login(self, username: str, password: str) -> Tuple[bool, str]:
+        """Check a password on the hashing pool, or against a live session if
+        the user logged in recently (e.g. Switch User back to them)"""
         try:
-            if not username or not password:
-                return False, "Username and password are required"
-                
-            if username not in self.users:
-                return False, "Invalid username or password"
-                
+            failure = self._login_precheck(username, password)
+            if failure:
+                return failure
+
             stored_password = self.users[username]["password"]
-            
-            if verify_password(password, stored_password):
+            if self.sessions.check(username, password, stored_password):
                 self.current_user = username
                 return True, "Login successful"
-            
-            return False, "Invalid username or password"
-            
+
+            verified = self.hasher.verify(password, stored_password).result()
+            ok, message = self._login_result(username, password, verified)
+            if ok:
+                self.current_user = username
+            return ok, message
+
+        except DataError as e:
+            return False, f"Login failed: {str(e)}"
+        except Exception as e:
+            return False, f"Unexpected error during login: {str(e)}"
+
+    async def login_async(self, username: str, password: str) -> Tuple[bool, str]:
+        """login() for asyncio callers; the event loop keeps running during bcrypt.
+
+        Only checks the password and issues a session: current_user belongs
+        to the interactive menu, not to the many clients of a server.
+        """
+        try:
+            failure = self._login_precheck(username, password)
+            if failure:
+                return failure
+
+            stored_password = self.users[username]["password"]
+            if self.sessions.check(username, password, stored_password):
+                return True, "Login successful"
+
+            verified = await self.hasher.verify_async(password, stored_password)
+            return self._login_result(username, password, verified)
+
         except DataError as e:
             return False, f"Login failed: {str(e)}"
         except Exception as e:
@@ -70,25 +198,29 @@ class UserManager:
         self.current_user = None
 
     def get_user_balance(self, username: str) -> float:
-        if username in self.users:
-            return self.users[username]["balance"]
-        return 0.0
+        """Income minus expenses, derived from the user's transactions"""
+        self._reload_users()
+        if username not in self.users:
+            return 0.0
+        if self.transaction_manager is None:
+            if self.storage is get_storage():
+                from managers import get_transaction_manager   # deferred: managers imports this module
+                self.transaction_manager = get_transaction_manager()
+            else:
+                self.transaction_manager = TransactionManager(self.storage, lazy=True)
+        return self.transaction_manager.get_user_aggregates(username).balance()
 
-    def update_balance(self, username: str, amount: float) -> None:
-        if username in self.users:
-            self.users[username]["balance"] += amount
-            save_users(self.users)
     def get_user_profile(self, username: Optional[str] = None) -> Optional[Dict]:
         if username is None:
             username = self.current_user
         if not username:
             return None
-        user = self.users.get(username)
-        if not user:
+        self._reload_users()
+        if username not in self.users:
             return None
         return {
             "username": username,
-            "balance": float(user.get("balance", 0.0)),
+            "balance": self.get_user_balance(username),
         }
 
     def get_current_user(self) -> Optional[str]: